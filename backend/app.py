@@ -4,15 +4,27 @@ from dotenv import load_dotenv
 
 from routes.auth_routes import auth
 from routes.predict_routes import predict
+from routes.export_routes import export
+from routes.metrics_routes import metrics
+from utils.admission import admission
+from utils.compression import compression
+from utils.json_provider import MongoJSONProvider
 
 load_dotenv()
 
 app = Flask(__name__)
+# orjson-backed encoder that understands ObjectId, datetime and NumPy values
+app.json = MongoJSONProvider(app)
 CORS(app)
 
 # Register routes
 app.register_blueprint(auth)
 app.register_blueprint(predict)
+app.register_blueprint(export)
+app.register_blueprint(metrics)
+# Registered after `metrics` so rejected requests are still timed
+app.register_blueprint(admission)
+app.register_blueprint(compression)
 
 @app.get("/")
 def home():
@@ -0,0 +1,47 @@
+"""
+Compare two benchmark result files written by bench.run_benchmarks.
+
+    python -m bench.compare baseline.json candidate.json --threshold 1.15
+
+Exits with status 1 if any stage's median got slower than `threshold` x.
+"""
+import argparse
+import json
+
+
+def _index(report):
+    return {(r["stage"], r["batch_size"]): r for r in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.15)
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        cand = json.load(f)
+
+    print(f"baseline:  {base['meta'].get('commit')}")
+    print(f"candidate: {cand['meta'].get('commit')}")
+    base_idx, cand_idx = _index(base), _index(cand)
+    regressions = 0
+    for key in sorted(set(base_idx) & set(cand_idx)):
+        old = base_idx[key]["median_s"]
+        new = cand_idx[key]["median_s"]
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:<36} n={key[1]:<6} {old * 1000:9.3f} -> {new * 1000:9.3f} ms  x{ratio:5.2f}{flag}")
+    for key in sorted(set(base_idx) ^ set(cand_idx)):
+        print(f"{key[0]:<36} n={key[1]:<6} only in {'baseline' if key in base_idx else 'candidate'}")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
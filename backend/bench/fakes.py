@@ -0,0 +1,258 @@
+"""
+Local stand-ins used by the offline benchmarks: an in-memory Mongo
+(mongomock, selected via `MONGO_URI=mongomock://`) and a fake Gemini backend
+with configurable latency and failure rate.
+
+Both must be installed before `database.mongo` / `utils.gemini_client` are
+imported.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+
+def use_mongomock():
+    """Point `database.mongo` at an in-memory mongomock client."""
+    if "database.mongo" in sys.modules:
+        raise RuntimeError("use_mongomock() must run before database.mongo is imported")
+    os.environ["MONGO_URI"] = "mongomock://localhost"
+    # config.py reads MONGO_URI at import time
+    if "config" in sys.modules:
+        sys.modules["config"].MONGO_URI = os.environ["MONGO_URI"]
+
+
+class FaultyCollection:
+    """Proxy around a (mongomock) collection that adds latency and failures.
+
+    Only the operations the routes use are slowed down; everything else is
+    passed straight through. Set `FaultyCollection.active = False` to pause
+    injection (e.g. while seeding data).
+    """
+
+    active = True
+
+    _OPERATIONS = {
+        "find",
+        "find_one",
+        "find_one_and_delete",
+        "find_one_and_update",
+        "insert_one",
+        "insert_many",
+        "update_one",
+        "update_many",
+        "delete_one",
+        "delete_many",
+        "aggregate",
+        "count_documents",
+        "bulk_write",
+    }
+
+    def __init__(self, collection, latency=0.0, failure_rate=0.0, rng=None):
+        self._collection = collection
+        self._latency = latency
+        self._failure_rate = failure_rate
+        self._rng = rng or random.Random(0)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in self._OPERATIONS:
+            return attr
+
+        def _op(*args, **kwargs):
+            if not FaultyCollection.active:
+                return attr(*args, **kwargs)
+            with self._lock:
+                fail = self._rng.random() < self._failure_rate
+            if self._latency:
+                time.sleep(self._latency)
+            if fail:
+                from pymongo.errors import AutoReconnect
+
+                raise AutoReconnect(f"injected failure in {name}")
+            return attr(*args, **kwargs)
+
+        return _op
+
+
+def inject_mongo_faults(latency=0.0, failure_rate=0.0, seed=0):
+    """Wrap every `*_collection` in `database.mongo` with `FaultyCollection`.
+
+    Must run after `use_mongomock()` and before any route module is imported,
+    since routes bind the collections at import time.
+    """
+    import database.mongo as mongo
+
+    rng = random.Random(seed)
+    for name in dir(mongo):
+        if name.endswith("_collection"):
+            setattr(
+                mongo,
+                name,
+                FaultyCollection(getattr(mongo, name), latency, failure_rate, rng),
+            )
+
+
+class FakeGenerativeModel:
+    """Drop-in for `genai.GenerativeModel` that sleeps instead of calling out."""
+
+    latency = 0.0
+    failure_rate = 0.0
+    _rng = random.Random(0)
+    _lock = threading.Lock()
+    prompt_chars = []
+    prompts = []
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def generate_content(self, prompt):
+        cls = type(self)
+        with cls._lock:
+            cls.prompt_chars.append(len(prompt))
+            cls.prompts.append(prompt)
+            fail = cls._rng.random() < cls.failure_rate
+        if cls.latency:
+            time.sleep(cls.latency)
+        if fail:
+            raise RuntimeError("fake Gemini failure")
+        return SimpleNamespace(
+            text="- Stay active most days of the week.\n"
+            "- Discuss blood pressure and cholesterol goals with a doctor.\n"
+            "- Avoid smoking and limit alcohol."
+        )
+
+
+def install_fake_gemini(latency=0.0, failure_rate=0.0, seed=0):
+    """Replace the Gemini SDK entry points with `FakeGenerativeModel`.
+
+    Works whether or not `google-generativeai` is installed.
+    """
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        google = sys.modules.setdefault("google", types.ModuleType("google"))
+        genai = types.ModuleType("google.generativeai")
+        google.generativeai = genai
+        sys.modules["google.generativeai"] = genai
+
+    FakeGenerativeModel.latency = float(latency)
+    FakeGenerativeModel.failure_rate = float(failure_rate)
+    FakeGenerativeModel._rng = random.Random(seed)
+    FakeGenerativeModel.prompt_chars = []
+    FakeGenerativeModel.prompts = []
+
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key-for-benchmarks")
+    return FakeGenerativeModel
+
+
+_CP = ["asymptomatic", "atypical angina", "non-anginal", "typical angina"]
+_RESTECG = ["lv hypertrophy", "normal", "st-t abnormality"]
+_SLOPE = ["downsloping", "flat", "upsloping"]
+_THAL = ["fixed defect", "normal", "reversable defect"]
+
+
+def sample_features(rng):
+    """Return one realistic /predict feature dict."""
+    return {
+        "age": rng.randint(29, 77),
+        "sex": rng.randint(0, 1),
+        "cp": rng.choice(_CP),
+        "trestbps": rng.randint(94, 200),
+        "chol": rng.randint(126, 564),
+        "fbs": rng.randint(0, 1),
+        "restecg": rng.choice(_RESTECG),
+        "thalach": rng.randint(71, 202),
+        "exang": rng.randint(0, 1),
+        "oldpeak": round(rng.uniform(0, 6.2), 1),
+        "slope": rng.choice(_SLOPE),
+        "ca": rng.randint(0, 3),
+        "thal": rng.choice(_THAL),
+    }
+
+
+# Output columns of the saved preprocessor, as they appear in SHAP results.
+FEATURE_NAMES = (
+    [f"num__{c}" for c in ("age", "sex", "trestbps", "chol", "thalch", "oldpeak", "ca")]
+    + [f"cat__cp_{v}" for v in _CP]
+    + [f"cat__restecg_{v}" for v in _RESTECG]
+    + [f"cat__slope_{v}" for v in _SLOPE]
+    + [f"cat__thal_{v}" for v in _THAL]
+    + [f"cat__chol_cat_{v}" for v in ("Borderline", "High", "Normal")]
+    + [f"cat__bp_cat_{v}" for v in ("Elevated", "High", "Normal")]
+)
+
+
+def sample_top_features(rng, top=5):
+    """Return a `get_top_features`-shaped list with full-precision SHAP values."""
+    return [
+        {"feature": name, "value": rng.uniform(-0.3, 0.3)}
+        for name in rng.sample(FEATURE_NAMES, top)
+    ]
+
+
+def sample_lifestyle(rng):
+    return {
+        "smoking_status": rng.choice(["never", "former", "current"]),
+        "diabetes_status": rng.choice(["no", "prediabetes", "yes"]),
+        "family_history_diabetes": rng.choice(["no", "yes"]),
+        "pregnancy_status": "not_applicable",
+    }
+
+
+def history_document(email, i, rng, narrative_id=None, patients=50):
+    """Return the `i`-th prediction document (same shape as /predict writes) for `email`."""
+    features = sample_features(rng)
+    lifestyle = sample_lifestyle(rng)
+    score = rng.random()
+    patient_name = f"Patient {i % patients}"
+    return {
+        "created_at": datetime(2024, 1, 1) + timedelta(hours=i),
+        "userId": email,
+        "doctorId": email,
+        "patientId": f"{email}::{patient_name.lower()}",
+        "patientName": patient_name,
+        "input": features,
+        "risk_score": score,
+        "risk_level": "Low" if score < 0.33 else "Moderate" if score < 0.66 else "High",
+        "trestbps": features["trestbps"],
+        "chol": features["chol"],
+        "thalach": features["thalach"],
+        "oldpeak": features["oldpeak"],
+        "restecg": features["restecg"],
+        **lifestyle,
+        "top_features": [
+            {"feature": f"num__f{j}", "value": rng.uniform(-0.2, 0.2)} for j in range(5)
+        ],
+        "narrative_id": narrative_id,
+    }
+
+
+def seed_history(email, n, rng, patients=50):
+    """Insert `n` prediction documents (same shape as /predict writes) for `email`."""
+    from database.mongo import narratives_collection, predictions_collection
+    from utils.narratives import build_narrative_document
+
+    predictions_collection.delete_many({"userId": email})
+    narrative_ids = narratives_collection.insert_many(
+        [
+            build_narrative_document(
+                {
+                    "explanation_text": "Your predicted heart disease risk is Moderate. " * 6,
+                    "lifestyle_suggestions": ["Stay active.", "Eat a balanced diet.", "Avoid smoking."],
+                    "followup_plan": "- Ask about further tests.\n- Review blood pressure.\n" * 3,
+                    "prescription_summary": "1) Clinical focus areas\n- Blood pressure\n" * 8,
+                }
+            )
+            for _ in range(n)
+        ]
+    ).inserted_ids
+    docs = [history_document(email, i, rng, nid, patients) for i, nid in enumerate(narrative_ids)]
+    predictions_collection.insert_many(docs)
@@ -0,0 +1,141 @@
+"""
+Benchmark JSON encoding of large history payloads.
+
+Compares the previous route code path (copy every document field by field,
+stringify `_id` / `.isoformat()` dates, then Flask's default `json` provider)
+with returning the Mongo documents as-is through utils/json_provider.py
+(orjson when installed). Documents are built in memory, so only
+serialization is measured.
+
+Run from `backend/`:
+
+    python -m bench.json_encoding --sizes 100,1000,10000 --out json_encoding.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from bench.fakes import history_document
+
+_PROFILE_FIELDS = (
+    "risk_score",
+    "risk_level",
+    "trestbps",
+    "chol",
+    "thalach",
+    "oldpeak",
+    "restecg",
+    "smoking_status",
+    "diabetes_status",
+    "family_history_diabetes",
+    "pregnancy_status",
+)
+
+
+def _legacy_history(docs, provider):
+    items = []
+    for doc in docs:
+        doc["id"] = str(doc.pop("_id", ""))
+        created_at = doc.get("created_at")
+        if hasattr(created_at, "isoformat"):
+            doc["created_at"] = created_at.isoformat()
+        items.append(doc)
+    return provider.dumps({"items": items})
+
+
+def _legacy_profile(docs, provider):
+    history = []
+    for doc in docs:
+        created_at = doc.get("created_at")
+        item = {
+            "id": str(doc.get("_id")),
+            "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else None,
+        }
+        for field in _PROFILE_FIELDS:
+            item[field] = doc.get(field)
+        item["input"] = doc.get("input", {})
+        history.append(item)
+    return provider.dumps({"history": history})
+
+
+def _new_history(docs, dumps_bytes):
+    for doc in docs:
+        doc["id"] = doc.pop("_id", "")
+    return dumps_bytes({"items": docs})
+
+
+def _new_profile(docs, dumps_bytes):
+    # Profile documents come back from Mongo already projected.
+    for doc in docs:
+        doc["id"] = doc.pop("_id", None)
+    return dumps_bytes({"history": docs})
+
+
+def _measure(fn, make_docs, repeat):
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        docs = make_docs()
+        start = time.perf_counter()
+        size = len(fn(docs))
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History payload JSON encoding benchmark")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    from utils.json_provider import dumps_bytes, orjson
+
+    provider = DefaultJSONProvider(Flask(__name__))
+    profile_keys = ("_id", "created_at", "input") + _PROFILE_FIELDS
+    results = []
+    for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        rng = random.Random(args.seed)
+        base = [{"_id": ObjectId(), **history_document("bench@example.com", i, rng)} for i in range(n)]
+        base_profile = [{k: d[k] for k in profile_keys} for d in base]
+        cases = (
+            ("history", lambda: [dict(d) for d in base], _legacy_history, _new_history),
+            ("profile", lambda: [dict(d) for d in base_profile], _legacy_profile, _new_profile),
+        )
+        for payload, make_docs, legacy, new in cases:
+            old_s, old_bytes = _measure(lambda docs: legacy(docs, provider), make_docs, args.repeat)
+            new_s, new_bytes = _measure(lambda docs: new(docs, dumps_bytes), make_docs, args.repeat)
+            results.append(
+                {
+                    "payload": payload,
+                    "documents": n,
+                    "legacy_ms": old_s * 1000,
+                    "new_ms": new_s * 1000,
+                    "speedup": old_s / new_s if new_s else None,
+                    "legacy_bytes": old_bytes,
+                    "new_bytes": new_bytes,
+                }
+            )
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'stdlib json (orjson not installed)'}")
+    print(f"{'payload':<8} {'docs':>6} {'legacy ms':>10} {'new ms':>9} {'speedup':>8}")
+    for r in results:
+        print(
+            f"{r['payload']:<8} {r['documents']:>6} {r['legacy_ms']:>10.2f} {r['new_ms']:>9.2f}"
+            f" {r['speedup']:>7.1f}x"
+        )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"encoder": "orjson" if orjson is not None else "json", "results": results}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+End-to-end load test for the Flask app with a concurrency sweep.
+
+By default the real `app` is served in-process by waitress (a production
+WSGI server) with Mongo replaced by mongomock and Gemini by the fake backend
+from bench/fakes.py, both with injectable latency and failure rates. Pass
+`--target http://host:port` to drive an already running server instead
+(seeding and fault injection are then skipped).
+
+Run from `backend/`:
+
+    python -m bench.loadtest --concurrency 1,4,16,64 --duration 20 --out loadtest.json
+
+For each concurrency level it reports throughput, p50/p95/p99 latency,
+status codes and error rate per endpoint. Admission control answers with
+429/503 by design; those are reported as rejections, not errors. The local
+app runs with admission control off unless `--admission` is given.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+from bench.fakes import (
+    FaultyCollection,
+    inject_mongo_faults,
+    install_fake_gemini,
+    sample_features,
+    sample_lifestyle,
+    seed_history,
+    use_mongomock,
+)
+
+DEFAULT_MIX = "login=10,predict=20,history=30,doctor_patients=25,doctor_patient=15"
+_PASSWORD = "loadtest-password"
+
+# Status codes returned by admission control (rate limited / overloaded).
+_REJECTED = (429, 503)
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return None
+    # nearest-rank percentile
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class Doctor:
+    def __init__(self, email, password, token, patients):
+        self.email = email
+        self.password = password
+        self.token = token
+        self.patients = patients
+
+
+def _request_login(doctor, rng):
+    return "POST", "/login", {"email": doctor.email, "password": doctor.password}
+
+
+def _request_predict(doctor, rng):
+    return "POST", "/predict", {
+        "features": sample_features(rng),
+        "lifestyle": sample_lifestyle(rng),
+        "patientName": rng.choice(doctor.patients),
+    }
+
+
+def _request_history(doctor, rng):
+    return "GET", f"/history/{quote(doctor.email)}", None
+
+
+def _request_doctor_patients(doctor, rng):
+    return "GET", "/doctor/patients", None
+
+
+def _request_doctor_patient(doctor, rng):
+    patient_id = f"{doctor.email}::{rng.choice(doctor.patients).lower()}"
+    return "GET", f"/doctor/patient/{quote(patient_id, safe='')}", None
+
+
+ENDPOINTS = {
+    "login": _request_login,
+    "predict": _request_predict,
+    "history": _request_history,
+    "doctor_patients": _request_doctor_patients,
+    "doctor_patient": _request_doctor_patient,
+}
+
+
+def _setup_local(args):
+    """Install stand-ins, seed data and start waitress. Returns (base_url, doctors)."""
+    # Read by config at import time, so set before the app is imported.
+    os.environ["ADMISSION_CONTROL"] = "1" if args.admission else "0"
+    use_mongomock()
+    install_fake_gemini(
+        latency=args.gemini_latency, failure_rate=args.gemini_failure_rate, seed=args.seed
+    )
+    inject_mongo_faults(
+        latency=args.mongo_latency, failure_rate=args.mongo_failure_rate, seed=args.seed
+    )
+
+    from waitress import create_server
+
+    from app import app
+    from database.mongo import users_collection
+    from utils.hashing import hash_password
+    from utils.token import generate_token
+
+    rng = random.Random(args.seed)
+    FaultyCollection.active = False
+    password_hash = hash_password(_PASSWORD)
+    doctors = []
+    for i in range(args.doctors):
+        email = f"doctor{i}@loadtest.local"
+        users_collection.insert_one(
+            {"name": f"Doctor {i}", "email": email, "password": password_hash, "role": "Doctor"}
+        )
+        seed_history(email, args.seed_predictions, rng, patients=args.patients)
+        doctors.append(
+            Doctor(
+                email,
+                _PASSWORD,
+                generate_token(email, name=f"Doctor {i}", role="Doctor"),
+                [f"Patient {p}" for p in range(args.patients)],
+            )
+        )
+    FaultyCollection.active = True
+
+    server = create_server(app, host="127.0.0.1", port=0, threads=args.server_threads)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.effective_port}", doctors
+
+
+def _setup_remote(args):
+    """Log in pre-existing doctors on a running server (`--target`)."""
+    if not args.doctor_emails:
+        raise SystemExit("--target requires --doctor-emails (accounts with --doctor-password)")
+    doctors = []
+    for email in args.doctor_emails.split(","):
+        status, body = _send(args.target, "POST", "/login", {"email": email, "password": args.doctor_password})
+        if status != 200:
+            raise SystemExit(f"Login failed for {email}: {status}")
+        doctors.append(
+            Doctor(
+                email,
+                args.doctor_password,
+                json.loads(body)["token"],
+                [f"Patient {p}" for p in range(args.patients)],
+            )
+        )
+    return args.target, doctors
+
+
+def _send(base_url, method, path, body, token=None, conn=None):
+    parts = urlsplit(base_url)
+    own = conn is None
+    if own:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    try:
+        conn.request(method, path, body=data, headers=headers)
+        resp = conn.getresponse()
+        payload = resp.read()
+        return resp.status, payload
+    finally:
+        if own:
+            conn.close()
+
+
+def _run_level(base_url, doctors, mix, concurrency, duration, seed):
+    """Drive `concurrency` closed-loop workers for `duration` seconds."""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = []  # (endpoint, latency_s, status or None on exception)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    parts = urlsplit(base_url)
+
+    def worker(idx):
+        rng = random.Random(seed * 1000 + idx)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            doctor = rng.choice(doctors)
+            method, path, body = ENDPOINTS[name](doctor, rng)
+            start = time.perf_counter()
+            try:
+                status, _ = _send(base_url, method, path, body, token=doctor.token, conn=conn)
+            except Exception:
+                status = None
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            local.append((name, time.perf_counter() - start, status))
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return _report(samples, elapsed, concurrency)
+
+
+def _is_error(status):
+    return status is None or (status >= 400 and status not in _REJECTED)
+
+
+def _stats(latencies, statuses, elapsed):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    codes = {}
+    for status in statuses:
+        code = "exception" if status is None else str(status)
+        codes[code] = codes.get(code, 0) + 1
+    errors = sum(1 for status in statuses if _is_error(status))
+    rejected = sum(1 for status in statuses if status in _REJECTED)
+    return {
+        "requests": count,
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "error_rate": errors / count if count else 0.0,
+        "rejected_rate": rejected / count if count else 0.0,
+        "status_codes": dict(sorted(codes.items())),
+        "p50_ms": _ms(_percentile(ordered, 50)),
+        "p95_ms": _ms(_percentile(ordered, 95)),
+        "p99_ms": _ms(_percentile(ordered, 99)),
+        "max_ms": _ms(ordered[-1] if ordered else None),
+    }
+
+
+def _ms(value):
+    return None if value is None else value * 1000.0
+
+
+def _report(samples, elapsed, concurrency):
+    by_endpoint = {}
+    for name, latency, status in samples:
+        entry = by_endpoint.setdefault(name, ([], []))
+        entry[0].append(latency)
+        entry[1].append(status)
+    endpoints = {
+        name: _stats(latencies, statuses, elapsed)
+        for name, (latencies, statuses) in sorted(by_endpoint.items())
+    }
+    total = _stats([s[1] for s in samples], [s[2] for s in samples], elapsed)
+    return {"concurrency": concurrency, "duration_s": elapsed, "total": total, "endpoints": endpoints}
+
+
+def _print_level(level):
+    print(f"\nconcurrency={level['concurrency']}  ({level['duration_s']:.1f}s)")
+    print(
+        f"  {'endpoint':<16} {'reqs':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+        f" {'err%':>6} {'rej%':>6}"
+    )
+    rows = list(level["endpoints"].items()) + [("TOTAL", level["total"])]
+    for name, s in rows:
+        print(
+            f"  {name:<16} {s['requests']:>7} {s['throughput_rps']:>8.1f}"
+            f" {s['p50_ms'] or 0:>8.1f}ms {s['p95_ms'] or 0:>8.1f}ms {s['p99_ms'] or 0:>8.1f}ms"
+            f" {s['error_rate'] * 100:>5.1f}% {s['rejected_rate'] * 100:>5.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CardioNova load test with a concurrency sweep")
+    parser.add_argument("--concurrency", default="1,4,16,32")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    parser.add_argument("--server-threads", type=int, default=8, help="waitress worker threads")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=50, help="patients per doctor")
+    parser.add_argument("--seed-predictions", type=int, default=200, help="history rows per doctor")
+    parser.add_argument("--mongo-latency", type=float, default=0.002)
+    parser.add_argument("--mongo-failure-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency", type=float, default=0.8)
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--admission",
+        action="store_true",
+        help="keep admission control (rate limits, in-flight caps) on for the local app",
+    )
+    parser.add_argument("--target", help="drive an already running server instead")
+    parser.add_argument("--doctor-emails", help="comma-separated accounts for --target")
+    parser.add_argument("--doctor-password", default=_PASSWORD)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    if args.target:
+        base_url, doctors = _setup_remote(args)
+    else:
+        base_url, doctors = _setup_local(args)
+    print(f"Target: {base_url}", file=sys.stderr)
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        level = _run_level(base_url, doctors, mix, concurrency, args.duration, args.seed)
+        _print_level(level)
+        levels.append(level)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": base_url,
+            "params": vars(args),
+        },
+        "levels": levels,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
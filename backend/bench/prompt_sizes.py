@@ -0,0 +1,83 @@
+"""
+Compare Gemini prompt sizes with the raw and compact input encodings.
+
+Builds the four /predict prompts for sampled patients with each
+PROMPT_ENCODING (Gemini is replaced by the fake backend, which records every
+prompt it receives) and reports characters and estimated tokens per stage.
+
+Run from `backend/`:
+
+    python -m bench.prompt_sizes --samples 200 --out prompt_sizes.json
+"""
+import argparse
+import json
+import random
+import statistics
+
+from bench.fakes import install_fake_gemini, sample_features, sample_top_features
+
+_STAGES = ("gemini_explanation", "gemini_lifestyle", "gemini_followup", "gemini_prescription")
+
+
+def measure(encoding, samples, seed=0):
+    """Return {stage: [prompt, ...]} for one encoding."""
+    import utils.prompt_builder as prompt_builder
+    from utils.gemini_client import (
+        generate_explanation,
+        generate_followup_plan,
+        generate_lifestyle_suggestions,
+        generate_prescription_summary,
+    )
+
+    prompt_builder.PROMPT_ENCODING = encoding
+    fake = install_fake_gemini()
+    rng = random.Random(seed)
+    for _ in range(samples):
+        inputs = sample_features(rng)
+        top_features = sample_top_features(rng)
+        score = rng.random()
+        level = "Low" if score < 0.33 else "Moderate" if score < 0.66 else "High"
+        for fn in (
+            generate_explanation,
+            generate_lifestyle_suggestions,
+            generate_followup_plan,
+            generate_prescription_summary,
+        ):
+            fn(inputs, score, level, top_features)
+    # The fake records one prompt per call, in call order.
+    return {stage: fake.prompts[i::len(_STAGES)] for i, stage in enumerate(_STAGES)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare raw vs compact Gemini prompt sizes")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the summary as JSON")
+    args = parser.parse_args()
+
+    from utils.prompt_builder import estimate_tokens
+
+    prompts = {enc: measure(enc, args.samples, args.seed) for enc in ("raw", "compact")}
+    rows = []
+    for stage in _STAGES:
+        row = {"stage": stage}
+        for enc in ("raw", "compact"):
+            row[f"{enc}_chars"] = statistics.fmean(len(p) for p in prompts[enc][stage])
+            row[f"{enc}_tokens"] = statistics.fmean(estimate_tokens(p) for p in prompts[enc][stage])
+        row["reduction"] = 1 - row["compact_tokens"] / row["raw_tokens"] if row["raw_tokens"] else 0.0
+        rows.append(row)
+
+    print(f"{'stage':<22} {'raw tok':>8} {'compact tok':>12} {'reduction':>10}")
+    for r in rows:
+        print(
+            f"{r['stage']:<22} {r['raw_tokens']:>8.1f} {r['compact_tokens']:>12.1f}"
+            f" {r['reduction'] * 100:>9.1f}%"
+        )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"samples": args.samples, "seed": args.seed, "results": rows}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Local replica-set stand-in for exercising read preferences and write concerns.
+
+Starts N `mongod` processes (MongoDB server binaries must be installed) on
+consecutive ports as one replica set, waits for a primary and prints the
+MONGO_URI to use. mongomock has no notion of secondaries, so this is what
+`MONGO_READ_PREFERENCE` / `MONGO_HISTORY_W` should be tested against.
+
+Run from `backend/`:
+
+    python -m bench.replset start --nodes 3 --port 27117
+    MONGO_URI="mongodb://127.0.0.1:27117,127.0.0.1:27118,127.0.0.1:27119/?replicaSet=rs0" \\
+        MONGO_READ_PREFERENCE=secondaryPreferred python app.py
+    python -m bench.replset stop
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import time
+
+from pymongo import MongoClient
+
+_STATE_FILE = "replset.json"
+
+
+def _uri(ports, name):
+    hosts = ",".join(f"127.0.0.1:{p}" for p in ports)
+    return f"mongodb://{hosts}/?replicaSet={name}"
+
+
+def _wait(predicate, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"Timed out waiting for {what}")
+
+
+def start(nodes, port, name, dbpath, mongod, timeout):
+    binary = shutil.which(mongod)
+    if binary is None:
+        raise SystemExit(f"{mongod} not found; install the MongoDB server or pass --mongod")
+    ports = [port + i for i in range(nodes)]
+    pids = []
+    for p in ports:
+        path = os.path.join(dbpath, str(p))
+        os.makedirs(path, exist_ok=True)
+        proc = subprocess.Popen(
+            [
+                binary,
+                "--replSet", name,
+                "--port", str(p),
+                "--bind_ip", "127.0.0.1",
+                "--dbpath", path,
+                "--logpath", os.path.join(path, "mongod.log"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        pids.append(proc.pid)
+    with open(os.path.join(dbpath, _STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump({"pids": pids, "ports": ports, "name": name}, f)
+
+    seed = MongoClient("127.0.0.1", ports[0], directConnection=True, serverSelectionTimeoutMS=1000)
+    _wait(lambda: seed.admin.command("ping"), timeout, "mongod to accept connections")
+    try:
+        seed.admin.command(
+            "replSetInitiate",
+            {
+                "_id": name,
+                "members": [
+                    # Only the first member can become primary, so reads
+                    # routed to secondaries are predictable in tests.
+                    {"_id": i, "host": f"127.0.0.1:{p}", "priority": 1 if i == 0 else 0}
+                    for i, p in enumerate(ports)
+                ],
+            },
+        )
+    except Exception as e:
+        if "already initialized" not in str(e):
+            raise
+    _wait(lambda: seed.admin.command("hello").get("isWritablePrimary"), timeout, "a primary")
+    print(_uri(ports, name))
+
+
+def stop(dbpath, remove):
+    state_path = os.path.join(dbpath, _STATE_FILE)
+    if not os.path.exists(state_path):
+        raise SystemExit(f"No replica set state in {dbpath}")
+    with open(state_path, encoding="utf-8") as f:
+        state = json.load(f)
+    for pid in state["pids"]:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    os.remove(state_path)
+    if remove:
+        shutil.rmtree(dbpath, ignore_errors=True)
+    print(f"Stopped {len(state['pids'])} mongod processes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MongoDB replica set for testing")
+    parser.add_argument("command", choices=["start", "stop"])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--port", type=int, default=27117)
+    parser.add_argument("--name", default="rs0")
+    parser.add_argument("--dbpath", default=".replset")
+    parser.add_argument("--mongod", default="mongod")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--remove", action="store_true", help="delete the data directories on stop")
+    args = parser.parse_args()
+
+    if args.command == "start":
+        start(args.nodes, args.port, args.name, args.dbpath, args.mongod, args.timeout)
+    else:
+        stop(args.dbpath, args.remove)
+
+
+if __name__ == "__main__":
+    main()
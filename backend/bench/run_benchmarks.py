@@ -0,0 +1,252 @@
+"""
+Offline microbenchmarks for every /predict pipeline stage.
+
+Runs without network access: Mongo is replaced by mongomock and Gemini by a
+fake backend with configurable latency (see bench/fakes.py). Results are
+written as JSON so runs on different commits can be compared with
+`python -m bench.compare old.json new.json`.
+
+Admission control is turned off (`ADMISSION_CONTROL=0`) so the end-to-end
+stages measure the pipeline, not the per-caller rate limits; pass
+`--admission` to keep it on.
+
+Run from `backend/`:
+
+    python -m bench.run_benchmarks --out bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from bench.fakes import (
+    install_fake_gemini,
+    sample_features,
+    sample_lifestyle,
+    seed_history,
+    use_mongomock,
+)
+
+_MODEL_FILES = {
+    "preprocessor": "models/preprocessor.joblib",
+    "logistic": "models/logistic_model.joblib",
+    "rf": "models/rf_model.joblib",
+    "xgb": "models/xgb_model.joblib",
+}
+
+
+def _time(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _summary(stage, batch_size, samples):
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "stage": stage,
+        "batch_size": batch_size,
+        "repeat": len(samples),
+        "min_s": ordered[0],
+        "median_s": median,
+        "mean_s": statistics.fmean(ordered),
+        "p95_s": p95,
+        "per_item_us": median / batch_size * 1e6,
+    }
+
+
+def _bench(results, skipped, stage, batch_size, fn, repeat):
+    """Time `fn` and append a summary; a failing stage is recorded as skipped."""
+    try:
+        results.append(_summary(stage, batch_size, _time(fn, repeat)))
+    except Exception as e:
+        skipped.append({"stage": stage, "batch_size": batch_size, "reason": f"{type(e).__name__}: {e}"})
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _load_models():
+    import joblib
+
+    models, missing = {}, {}
+    for name, path in _MODEL_FILES.items():
+        try:
+            models[name] = joblib.load(path)
+        except Exception as e:
+            missing[name] = f"{path}: {e}"
+    return models, missing
+
+
+def run(batch_sizes, repeat, shap_max_batch, seed=0):
+    """Run all stages; return (results, skipped)."""
+    from utils.features import build_feature_frame
+    from utils.shap_handler import get_top_features
+    from utils.token import decode_token, generate_token
+
+    rng = random.Random(seed)
+    results, skipped = [], []
+    models, missing = _load_models()
+    for name, reason in missing.items():
+        skipped.append({"stage": f"load_{name}", "reason": reason})
+
+    explainer = None
+    if "rf" in models:
+        import shap
+
+        explainer = shap.TreeExplainer(models["rf"])
+    else:
+        skipped.append({"stage": "shap", "reason": "rf model missing"})
+
+    for n in batch_sizes:
+        rows = [sample_features(rng) for _ in range(n)]
+        payload = rows[0] if n == 1 else rows
+        print(f"batch_size={n}", file=sys.stderr)
+
+        _bench(results, skipped, "derive_features", n, lambda: build_feature_frame(payload), repeat)
+        df = build_feature_frame(payload)
+
+        preprocessor = models.get("preprocessor")
+        if preprocessor is None:
+            continue
+        _bench(results, skipped, "preprocess", n, lambda: preprocessor.transform(df), repeat)
+        processed = preprocessor.transform(df)
+
+        for name in ("logistic", "rf", "xgb"):
+            model = models.get(name)
+            if model is not None:
+                _bench(results, skipped, f"model_{name}", n, lambda: model.predict_proba(processed), repeat)
+
+        if explainer is not None and n <= shap_max_batch:
+            feature_names = preprocessor.get_feature_names_out()
+            x_np = processed.toarray() if hasattr(processed, "toarray") else processed
+            _bench(
+                results,
+                skipped,
+                "shap",
+                n,
+                lambda: get_top_features(explainer, x_np, feature_names),
+                repeat,
+            )
+
+        emails = [f"user{i}@example.com" for i in range(n)]
+        _bench(
+            results,
+            skipped,
+            "jwt_encode",
+            n,
+            lambda: [generate_token(e, name="Bench", role="Doctor") for e in emails],
+            repeat,
+        )
+        tokens = [generate_token(e, name="Bench", role="Doctor") for e in emails]
+        _bench(results, skipped, "jwt_decode", n, lambda: [decode_token(t) for t in tokens], repeat)
+
+    try:
+        from app import app
+    except Exception as e:
+        skipped.append({"stage": "history_serialization", "reason": f"app import failed: {e}"})
+        skipped.append({"stage": "end_to_end_predict", "reason": f"app import failed: {e}"})
+        return results, skipped
+
+    client = app.test_client()
+    for n in batch_sizes:
+        email = f"history{n}@example.com"
+        seed_history(email, n, rng)
+        headers = {"Authorization": f"Bearer {generate_token(email, name='Bench', role='Doctor')}"}
+        for stage, url in (
+            ("history_serialization", f"/history/{email}"),
+            ("history_serialization_narratives", f"/history/{email}?narratives=1"),
+        ):
+            def _get():
+                resp = client.get(url, headers=headers)
+                assert resp.status_code == 200, resp.status_code
+                return resp.data
+
+            _bench(results, skipped, stage, n, _get, repeat)
+
+    email = "e2e@example.com"
+    headers = {"Authorization": f"Bearer {generate_token(email, name='Bench', role='Doctor')}"}
+
+    def _predict():
+        body = {
+            "features": sample_features(rng),
+            "lifestyle": sample_lifestyle(rng),
+            "patientName": f"Patient {rng.randint(0, 49)}",
+        }
+        resp = client.post("/predict", json=body, headers=headers)
+        assert resp.status_code == 200, resp.status_code
+
+    _bench(results, skipped, "end_to_end_predict", 1, _predict, repeat)
+    return results, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CardioNova pipeline benchmarks")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="fake Gemini latency (s)")
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--shap-max-batch", type=int, default=1000, help="skip SHAP above this batch size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--admission", action="store_true", help="keep admission control on")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    # Read by config at import time, so set before the app is imported.
+    os.environ["ADMISSION_CONTROL"] = "1" if args.admission else "0"
+    use_mongomock()
+    install_fake_gemini(
+        latency=args.gemini_latency, failure_rate=args.gemini_failure_rate, seed=args.seed
+    )
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    started = time.time()
+    results, skipped = run(batch_sizes, args.repeat, args.shap_max_batch, seed=args.seed)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "duration_s": time.time() - started,
+            "params": vars(args),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for r in results:
+        print(
+            f"{r['stage']:<36} n={r['batch_size']:<6} median={r['median_s'] * 1000:9.3f} ms"
+            f"  per-item={r['per_item_us']:10.2f} us"
+        )
+    for s in skipped:
+        print(f"skipped {s['stage']}: {s['reason']}")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,3 +13,80 @@ MONGO_URI = os.environ.get(
 
 # JWT secret should also come from env in production
 JWT_SECRET = os.environ.get("JWT_SECRET", "YOUR_SECRET_KEY")
+
+# Codec used to compress LLM narrative text stored in `prediction_narratives`.
+# "zlib" is always available; "zstd" requires the optional `zstandard` package.
+NARRATIVE_CODEC = os.environ.get("NARRATIVE_CODEC", "zlib")
+
+# Add a `Server-Timing` header with per-stage durations to every response.
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+
+# Admission control (utils/admission.py). In-flight limits are per process.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+ADMISSION_MAX_INFLIGHT_PREDICT = int(os.environ.get("ADMISSION_MAX_INFLIGHT_PREDICT", "8"))
+ADMISSION_MAX_INFLIGHT_READ = int(os.environ.get("ADMISSION_MAX_INFLIGHT_READ", "32"))
+# Skip the Gemini sections once this fraction of the /predict slots is busy
+# (set to 0 to never degrade).
+ADMISSION_DEGRADE_AT = float(os.environ.get("ADMISSION_DEGRADE_AT", "0.75"))
+# Per-doctor token buckets: sustained requests per minute and burst size.
+RATE_LIMIT_PREDICT_PER_MIN = float(os.environ.get("RATE_LIMIT_PREDICT_PER_MIN", "30"))
+RATE_LIMIT_PREDICT_BURST = int(os.environ.get("RATE_LIMIT_PREDICT_BURST", "10"))
+RATE_LIMIT_READ_PER_MIN = float(os.environ.get("RATE_LIMIT_READ_PER_MIN", "240"))
+RATE_LIMIT_READ_BURST = int(os.environ.get("RATE_LIMIT_READ_BURST", "60"))
+
+# Response compression (utils/compression.py): JSON bodies at least this large
+# are gzip/brotli-compressed when the client accepts it.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+# Idempotent /predict (utils/idempotency.py). Backend is "memory" (per-process
+# LRU) or "mongo" (shared TTL collection, works across workers).
+IDEMPOTENCY_BACKEND = os.environ.get("IDEMPOTENCY_BACKEND", "memory")
+# How long a response stored under an explicit Idempotency-Key is replayed.
+IDEMPOTENCY_KEY_TTL_S = int(os.environ.get("IDEMPOTENCY_KEY_TTL_S", "86400"))
+# Window in which an identical doctor/patient/inputs resubmission is a duplicate.
+IDEMPOTENCY_AUTO_WINDOW_S = int(os.environ.get("IDEMPOTENCY_AUTO_WINDOW_S", "60"))
+# Longest a duplicate waits for the in-flight original before computing itself.
+IDEMPOTENCY_WAIT_S = float(os.environ.get("IDEMPOTENCY_WAIT_S", "60"))
+IDEMPOTENCY_MEMORY_MAX = int(os.environ.get("IDEMPOTENCY_MEMORY_MAX", "10000"))
+
+# Retention (utils/retention.py, scripts/archive_predictions.py): predictions
+# older than the hot window move to cold storage. Target is "collection"
+# (predictions_archive) or "files" (gzip NDJSON partitioned by day under
+# RETENTION_ARCHIVE_DIR). A TTL of 0 keeps archived data forever.
+RETENTION_HOT_DAYS = int(os.environ.get("RETENTION_HOT_DAYS", "365"))
+RETENTION_ARCHIVE_TARGET = os.environ.get("RETENTION_ARCHIVE_TARGET", "collection")
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "archive")
+RETENTION_ARCHIVE_TTL_DAYS = int(os.environ.get("RETENTION_ARCHIVE_TTL_DAYS", "0"))
+
+# Gemini prompt encoding (utils/prompt_builder.py). "compact" sends an ordered,
+# rounded clinical summary; "raw" sends the input dict and SHAP list reprs as
+# before (kept for comparison, see bench/prompt_sizes.py). Budgets are the
+# estimated token caps for the patient-data and top-feature prompt sections.
+PROMPT_ENCODING = os.environ.get("PROMPT_ENCODING", "compact")
+PROMPT_INPUTS_TOKEN_BUDGET = int(os.environ.get("PROMPT_INPUTS_TOKEN_BUDGET", "120"))
+PROMPT_FEATURES_TOKEN_BUDGET = int(os.environ.get("PROMPT_FEATURES_TOKEN_BUDGET", "60"))
+
+# Mongo connection management (database/mongo.py). Compressors is a
+# comma-separated list such as "zstd,snappy,zlib" (zstd/snappy need the
+# `zstandard` / `python-snappy` packages); empty disables wire compression.
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "")
+# Read preference for the dashboard read routes (history, doctor patients,
+# patient profile, search, export): primary, primaryPreferred, secondary,
+# secondaryPreferred or nearest. Max staleness (seconds, >= 90; -1 = no
+# limit) bounds how far behind a secondary may be to be selected.
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_S = int(os.environ.get("MONGO_MAX_STALENESS_S", "90"))
+# Read concern for the same routes: local, majority or available.
+MONGO_READ_CONCERN = os.environ.get("MONGO_READ_CONCERN", "local")
+# Write concern for /predict history inserts: w is a number or "majority".
+MONGO_HISTORY_W = os.environ.get("MONGO_HISTORY_W", "1")
+MONGO_HISTORY_JOURNAL = os.environ.get("MONGO_HISTORY_JOURNAL", "0").lower() in ("1", "true", "yes")
+MONGO_HISTORY_WTIMEOUT_MS = int(os.environ.get("MONGO_HISTORY_WTIMEOUT_MS", "0"))
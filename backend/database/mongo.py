@@ -1,10 +1,95 @@
-from pymongo import MongoClient
-from config import MONGO_URI
+from pymongo import MongoClient, ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (
+	Nearest,
+	Primary,
+	PrimaryPreferred,
+	Secondary,
+	SecondaryPreferred,
+)
+from pymongo.write_concern import WriteConcern
+from config import (
+	MONGO_COMPRESSORS,
+	MONGO_CONNECT_TIMEOUT_MS,
+	MONGO_HISTORY_JOURNAL,
+	MONGO_HISTORY_W,
+	MONGO_HISTORY_WTIMEOUT_MS,
+	MONGO_MAX_POOL_SIZE,
+	MONGO_MAX_STALENESS_S,
+	MONGO_MIN_POOL_SIZE,
+	MONGO_READ_CONCERN,
+	MONGO_READ_PREFERENCE,
+	MONGO_SERVER_SELECTION_TIMEOUT_MS,
+	MONGO_SOCKET_TIMEOUT_MS,
+	MONGO_URI,
+	MONGO_WAIT_QUEUE_TIMEOUT_MS,
+)
+from database.pool_monitor import PoolMetricsListener
 import sys
 
-# Create client with a short server selection timeout so failures surface promptly
+
+def _client_options():
+	options = {
+		"maxPoolSize": MONGO_MAX_POOL_SIZE,
+		"minPoolSize": MONGO_MIN_POOL_SIZE,
+		"waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+		"connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+		"socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+		# Short server selection timeout so failures surface promptly
+		"serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+		"event_listeners": [PoolMetricsListener(MONGO_MAX_POOL_SIZE)],
+	}
+	compressors = [c.strip() for c in MONGO_COMPRESSORS.split(",") if c.strip()]
+	if compressors:
+		options["compressors"] = compressors
+	return options
+
+
+def _create_client():
+	if MONGO_URI.startswith("mongomock://"):
+		# In-memory stand-in used by the offline benchmarks and load tests
+		# (requires the optional `mongomock` package, see bench/requirements.txt).
+		import mongomock
+
+		return mongomock.MongoClient()
+	return MongoClient(MONGO_URI, **_client_options())
+
+
+def _read_preference():
+	modes = {
+		"primary": Primary,
+		"primarypreferred": PrimaryPreferred,
+		"secondary": Secondary,
+		"secondarypreferred": SecondaryPreferred,
+		"nearest": Nearest,
+	}
+	mode = modes.get(MONGO_READ_PREFERENCE.lower())
+	if mode is None:
+		raise ValueError(f"Unknown MONGO_READ_PREFERENCE: {MONGO_READ_PREFERENCE}")
+	if mode is Primary:
+		return ReadPreference.PRIMARY
+	return mode(max_staleness=MONGO_MAX_STALENESS_S)
+
+
+
+def _read_concern():
+	level = MONGO_READ_CONCERN.lower()
+	if level not in ("local", "majority", "available"):
+		raise ValueError(f"Unknown MONGO_READ_CONCERN: {MONGO_READ_CONCERN}")
+	return ReadConcern(level)
+
+
+def _history_write_concern():
+	w = int(MONGO_HISTORY_W) if MONGO_HISTORY_W.isdigit() else MONGO_HISTORY_W
+	return WriteConcern(
+		w=w,
+		j=MONGO_HISTORY_JOURNAL or None,
+		wtimeout=MONGO_HISTORY_WTIMEOUT_MS or None,
+	)
+
+
 try:
-	client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+	client = _create_client()
 	# Perform a quick ping to validate authentication/connectivity
 	client.admin.command("ping")
 except Exception as e:
@@ -16,3 +101,24 @@ db = client["cardio_db"]
 
 users_collection = db["users"]
 predictions_collection = db["predictions"]
+# Compressed LLM narrative text, split out of `predictions` (see utils/narratives.py)
+narratives_collection = db["prediction_narratives"]
+# Per-resource change counters used as cheap ETag validators (see utils/etag.py)
+versions_collection = db["resource_versions"]
+# Stored /predict responses keyed by idempotency key (TTL on `expires_at`)
+idempotency_collection = db["idempotency_keys"]
+# Cold storage for predictions older than the retention hot window (see utils/retention.py)
+archive_collection = db["predictions_archive"]
+# One summary per (doctor, patient) with the latest assessment (see utils/patients.py)
+patients_collection = db["patients"]
+
+# Read preference and concern for dashboard read routes (see utils/read_routing.py).
+READ_ROUTE_PREFERENCE = _read_preference()
+READ_ROUTE_CONCERN = _read_concern()
+# Handles used for /predict history inserts, with the tunable write concern.
+history_predictions_collection = predictions_collection.with_options(
+	write_concern=_history_write_concern()
+)
+history_narratives_collection = narratives_collection.with_options(
+	write_concern=_history_write_concern()
+)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from pymongo import monitoring
+
+from utils.metrics import counter, gauge, histogram
+
+# Connection-pool metrics for the Mongo client (registered as an event
+# listener in database/mongo.py). Utilization is in_use / max_size.
+
+POOL_CONNECTIONS = gauge(
+    "cardionova_mongo_pool_connections",
+    "Mongo pool connections by server address and state (open, in_use).",
+)
+POOL_MAX_SIZE = gauge("cardionova_mongo_pool_max_size", "Configured maxPoolSize per server.")
+POOL_WAIT = histogram(
+    "cardionova_mongo_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+)
+POOL_CHECKOUT_FAILURES = counter(
+    "cardionova_mongo_pool_checkout_failures_total",
+    "Failed connection checkouts, by reason (timeout = wait queue full).",
+)
+
+
+def _address(address):
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+        # Check-out start times for pymongo < 4.7, whose events carry no duration.
+        self._started = threading.local()
+
+    def _wait(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self._started, "t", None)
+            duration = time.monotonic() - started if started is not None else None
+        if duration is not None:
+            POOL_WAIT.observe(duration, address=_address(event.address))
+
+    def pool_created(self, event):
+        POOL_MAX_SIZE.set(self.max_pool_size, address=_address(event.address))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        POOL_CONNECTIONS.set(0, address=_address(event.address), state="open")
+        POOL_CONNECTIONS.set(0, address=_address(event.address), state="in_use")
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(address=_address(event.address), state="open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(address=_address(event.address), state="open")
+
+    def connection_check_out_started(self, event):
+        self._started.t = time.monotonic()
+
+    def connection_check_out_failed(self, event):
+        self._wait(event)
+        POOL_CHECKOUT_FAILURES.inc(reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        self._wait(event)
+        POOL_CONNECTIONS.inc(address=_address(event.address), state="in_use")
+
+    def connection_checked_in(self, event):
+        POOL_CONNECTIONS.dec(address=_address(event.address), state="in_use")
@@ -0,0 +1,247 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from utils.token import decode_token
+from utils.narratives import NARRATIVE_FIELDS, attach_narratives
+from database.mongo import predictions_collection
+from utils.read_routing import reads
+from utils.json_provider import dumps_bytes
+
+export = Blueprint("export", __name__)
+
+# Fields a doctor may select for export. Narrative LLM text is deliberately not
+# part of the default set so that large exports stay small.
+EXPORT_FIELDS = [
+    "id",
+    "created_at",
+    "patientId",
+    "patientName",
+    "risk_score",
+    "risk_level",
+    "trestbps",
+    "chol",
+    "thalach",
+    "oldpeak",
+    "restecg",
+    "smoking_status",
+    "diabetes_status",
+    "family_history_diabetes",
+    "pregnancy_status",
+    "input",
+    "top_features",
+    "explanation_text",
+    "lifestyle_suggestions",
+    "followup_plan",
+    "prescription_summary",
+]
+DEFAULT_EXPORT_FIELDS = EXPORT_FIELDS[:15]
+
+# Rows are buffered into chunks of roughly this size before being yielded (and
+# compressed), so the per-row overhead of the generator stays small.
+_CHUNK_BYTES = 64 * 1024
+_CURSOR_BATCH_SIZE = 500
+
+
+def _parse_date(value):
+    """Parse an ISO date/datetime query parameter, returning None if empty."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def _to_plain(value):
+    """Convert Mongo/BSON values into JSON/CSV friendly Python values."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _row(doc, fields):
+    """Build an export row (ordered like `fields`) from a Mongo document."""
+    row = {}
+    for field in fields:
+        if field == "id":
+            row["id"] = str(doc.get("_id", ""))
+        else:
+            row[field] = _to_plain(doc.get(field))
+    return row
+
+
+def _with_narratives(cursor, fields):
+    """Yield cursor documents with requested narrative fields filled in.
+
+    Narratives are fetched one cursor batch at a time, so memory stays
+    bounded by the batch size.
+    """
+    wanted = [f for f in fields if f in NARRATIVE_FIELDS]
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= _CURSOR_BATCH_SIZE:
+            yield from attach_narratives(batch, wanted)
+            batch = []
+    if batch:
+        yield from attach_narratives(batch, wanted)
+
+
+def _ndjson_lines(cursor, fields):
+    # The shared encoder handles ObjectId/datetime, so no `_to_plain` pass.
+    for doc in cursor:
+        row = {field: doc.get("_id" if field == "id" else field) for field in fields}
+        yield dumps_bytes(row) + b"\n"
+
+
+def _csv_lines(cursor, fields):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    writer.writerow(fields)
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate(0)
+
+    for doc in cursor:
+        row = _row(doc, fields)
+        writer.writerow(
+            [
+                json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                for v in (row[f] for f in fields)
+            ]
+        )
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+
+
+def _chunked(lines, compress=False):
+    """Group lines (str or bytes) into ~_CHUNK_BYTES chunks, optionally gzip-encoded."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    parts = []
+    size = 0
+    for line in lines:
+        data = line if isinstance(line, bytes) else line.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= _CHUNK_BYTES:
+            chunk = b"".join(parts)
+            parts = []
+            size = 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    tail = b"".join(parts)
+    if compressor is not None:
+        tail = compressor.compress(tail) + compressor.flush()
+    if tail:
+        yield tail
+
+
+@export.route("/doctor/export", methods=["GET"])
+def export_doctor_predictions():
+    """Stream the logged-in doctor's predictions as NDJSON or CSV.
+
+    Query parameters:
+    - format: "ndjson" (default) or "csv"
+    - from / to: ISO dates bounding `created_at` (inclusive / exclusive)
+    - patient_id: restrict to a single patient
+    - fields: comma-separated subset of EXPORT_FIELDS
+    - compress: "gzip" to gzip the stream
+
+    Rows are read straight from the Mongo cursor and written out as they
+    arrive, so memory use does not depend on the size of the export.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return jsonify({"msg": "Authorization header missing"}), 401
+
+    token = auth_header.split(" ", 1)[1].strip()
+    try:
+        payload = decode_token(token)
+    except Exception as e:
+        return jsonify({"msg": "Invalid token", "error": str(e)}), 401
+
+    email = payload.get("email")
+    role = payload.get("role", "Doctor")
+    if not email:
+        return jsonify({"msg": "Unauthorized"}), 401
+    if role != "Doctor":
+        return jsonify({"msg": "Forbidden"}), 403
+
+    fmt = (request.args.get("format") or "ndjson").lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"msg": "Unsupported format", "error": fmt}), 400
+
+    compress = (request.args.get("compress") or "").lower()
+    if compress not in ("", "gzip"):
+        return jsonify({"msg": "Unsupported compression", "error": compress}), 400
+
+    fields_arg = request.args.get("fields")
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in EXPORT_FIELDS]
+        if unknown or not fields:
+            return jsonify({"msg": "Unknown export fields", "error": ", ".join(unknown)}), 400
+    else:
+        fields = list(DEFAULT_EXPORT_FIELDS)
+
+    try:
+        date_from = _parse_date(request.args.get("from"))
+        date_to = _parse_date(request.args.get("to"))
+    except ValueError as e:
+        return jsonify({"msg": "Invalid date", "error": str(e)}), 400
+
+    query = {"doctorId": email}
+    patient_id = request.args.get("patient_id")
+    if patient_id:
+        query["patientId"] = patient_id
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from
+        if date_to:
+            query["created_at"]["$lt"] = date_to
+
+    projection = {f: 1 for f in fields if f != "id"}
+    if "id" not in fields:
+        projection["_id"] = 0
+    wants_narratives = any(f in NARRATIVE_FIELDS for f in fields)
+    if wants_narratives:
+        projection["narrative_id"] = 1
+
+    try:
+        cursor = (
+            reads(predictions_collection).find(query, projection)
+            .sort("created_at", 1)
+            .batch_size(_CURSOR_BATCH_SIZE)
+        )
+    except Exception as e:
+        return jsonify({"msg": "Failed to export history", "error": str(e)}), 500
+
+    if wants_narratives:
+        cursor = _with_narratives(cursor, fields)
+
+    lines = _csv_lines(cursor, fields) if fmt == "csv" else _ndjson_lines(cursor, fields)
+    body = _chunked(lines, compress=bool(compress))
+
+    filename = f"predictions.{fmt}"
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    if compress:
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,38 @@
+from flask import Blueprint, Response, g, request
+import time
+from config import SERVER_TIMING_ENABLED
+from utils.metrics import histogram, render_prometheus, server_timing_header
+
+metrics = Blueprint("metrics", __name__)
+
+REQUEST_SECONDS = histogram(
+    "cardionova_http_request_duration_seconds",
+    "End-to-end request latency by endpoint and status code.",
+)
+
+
+@metrics.before_app_request
+def _start_request_timer():
+    g._request_start = time.perf_counter()
+
+
+@metrics.after_app_request
+def _observe_request(response):
+    start = g.get("_request_start")
+    if start is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=request.endpoint or "unknown",
+            status=str(response.status_code),
+        )
+    if SERVER_TIMING_ENABLED:
+        header = server_timing_header()
+        if header:
+            response.headers["Server-Timing"] = header
+    return response
+
+
+@metrics.get("/metrics")
+def prometheus_metrics():
+    """Expose stage latencies, fallbacks and error counts for Prometheus."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify
+import itertools
 import joblib
 import numpy as np
 from datetime import datetime
@@ -10,7 +11,30 @@ from utils.gemini_client import (
     generate_prescription_summary,
 )
 from utils.token import decode_token
-from database.mongo import predictions_collection
+from utils.metrics import timed, record_fallback
+from utils.features import build_feature_frame
+from utils.admission import should_degrade
+from utils.idempotency import request_key, run_once
+from utils.etag import (
+    bump_versions,
+    check_not_modified,
+    doctor_scope,
+    patient_scope,
+    user_scope,
+    with_etag,
+    current_version,
+)
+from utils.narratives import (
+    NARRATIVE_FIELDS,
+    attach_narratives,
+    delete_narratives,
+    save_narratives,
+)
+from utils.retention import load_archived_history
+from utils.patients import make_patient_id, record_latest, refresh_patient, search_patients
+from utils.cohort import apply_update, cohort_rank
+from utils.read_routing import reads
+from database.mongo import history_predictions_collection, predictions_collection
 from bson import ObjectId
 
 predict = Blueprint("predict", __name__)
@@ -25,86 +49,79 @@ xgb_model = joblib.load("models/xgb_model.joblib")
 import shap
 explainer = shap.TreeExplainer(rf_model)
 
+def _caller_email():
+    """Determine user identity from JWT (if provided)."""
+    auth_header = request.headers.get("Authorization", "")
+    user_email = None
+    if auth_header.startswith("Bearer "):
+        token = auth_header.split(" ", 1)[1].strip()
+        try:
+            payload = decode_token(token)
+            user_email = payload.get("email")
+        except Exception:
+            record_fallback("jwt_decode", "invalid_token")
+            # If token is invalid, we still allow prediction but do not tag user.
+            user_email = None
+    return user_email
+
+
 @predict.post("/predict")
 def predict_risk():
+    """Run a prediction, at most once per idempotency key.
+
+    Retries carrying the same `Idempotency-Key` header, or resubmitting the
+    same doctor/patient/inputs within a short window, get the stored response
+    instead of re-running the models, SHAP, Gemini and the history insert.
+    Concurrent duplicates wait for the in-flight computation.
+    """
     raw = request.json or {}
+    user_email = _caller_email()
+    patient_name = raw.get("patientName") or raw.get("patient_name")
+    features = raw.get("features") or raw
+    lifestyle = raw.get("lifestyle") or {}
+
+    key, ttl, fingerprint = request_key(
+        request.headers.get("Idempotency-Key"),
+        user_email or f"ip:{request.remote_addr}",
+        patient_name,
+        features,
+        lifestyle,
+    )
+    body, status, replayed = run_once(
+        key, ttl, fingerprint, lambda: _run_prediction(raw, user_email)
+    )
+    resp = jsonify(body)
+    resp.status_code = status
+    if replayed:
+        resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _run_prediction(raw, user_email):
+    """Score, explain and persist one prediction. Returns (body, status)."""
     patient_name = raw.get("patientName") or raw.get("patient_name")
     features = raw.get("features") or raw
     lifestyle = raw.get("lifestyle") or {}
 
     data = features
-    df = {key: [value] for key, value in data.items()}
-
-    import pandas as pd
-    df = pd.DataFrame(df)
-    # Ensure derived/renamed columns expected by the saved preprocessor are present.
-    # Some pipelines expect features like `age_group`, `bp_cat`, `chol_cat`, and a
-    # misspelled `thalch` (instead of `thalach`). Create them from raw inputs when
-    # possible so transform doesn't fail with missing columns.
-    if "thalach" in df.columns and "thalch" not in df.columns:
-        df["thalch"] = df["thalach"]
-
-    # age_group from `age` (simple binning that matches typical pipelines)
-    if "age" in df.columns and "age_group" not in df.columns:
-        def _age_group(a):
-            try:
-                a = float(a)
-            except Exception:
-                return "unknown"
-            if a < 31:
-                return "0-30"
-            if a < 46:
-                return "31-45"
-            if a < 61:
-                return "46-60"
-            return "61+"
-
-        df["age_group"] = df["age"].apply(_age_group)
-
-    # bp_cat from `trestbps`
-    if "trestbps" in df.columns and "bp_cat" not in df.columns:
-        def _bp_cat(b):
-            try:
-                b = float(b)
-            except Exception:
-                return "unknown"
-            if b < 120:
-                return "normal"
-            if b < 130:
-                return "elevated"
-            if b < 140:
-                return "hypertension1"
-            return "hypertension2"
-
-        df["bp_cat"] = df["trestbps"].apply(_bp_cat)
-
-    # chol_cat from `chol`
-    if "chol" in df.columns and "chol_cat" not in df.columns:
-        def _chol_cat(c):
-            try:
-                c = float(c)
-            except Exception:
-                return "unknown"
-            if c < 200:
-                return "normal"
-            if c < 240:
-                return "borderline"
-            return "high"
-
-        df["chol_cat"] = df["chol"].apply(_chol_cat)
+    df = build_feature_frame(data)
 
     # Preprocess
     try:
-        processed = preprocessor.transform(df)
+        with timed("preprocess"):
+            processed = preprocessor.transform(df)
     except ValueError as e:
         # Return a clear JSON error so frontend can show a helpful message
-        return jsonify({"msg": "Preprocessing failed", "error": str(e)}), 400
+        return {"msg": "Preprocessing failed", "error": str(e)}, 400
     feature_names = preprocessor.get_feature_names_out()
 
     # Ensemble predictions
-    p1 = log_model.predict_proba(processed)[0][1]
-    p2 = rf_model.predict_proba(processed)[0][1]
-    p3 = xgb_model.predict_proba(processed)[0][1]
+    with timed("model_logistic"):
+        p1 = log_model.predict_proba(processed)[0][1]
+    with timed("model_rf"):
+        p2 = rf_model.predict_proba(processed)[0][1]
+    with timed("model_xgb"):
+        p3 = xgb_model.predict_proba(processed)[0][1]
 
     final_score = (p1 + p2 + p3) / 3
 
@@ -125,47 +142,42 @@ def predict_risk():
     except Exception as e:
         top_features = []
         shap_error = str(e)
+        record_fallback("shap", "error")
 
     # Gemini-powered natural language explanation and lifestyle suggestions.
     # These calls are best-effort: if the Gemini client is not configured,
-    # the helper functions fall back to simple, safe templates.
+    # the helper functions fall back to simple, safe templates. Under load,
+    # admission control asks us to skip them and return the score quickly.
+    degraded = should_degrade()
     explanation_text = generate_explanation(
         data,
         float(final_score),
         risk,
         top_features,
+        use_llm=not degraded,
     )
     lifestyle_suggestions = generate_lifestyle_suggestions(
         data,
         float(final_score),
         risk,
         top_features,
+        use_llm=not degraded,
     )
     followup_plan = generate_followup_plan(
         data,
         float(final_score),
         risk,
         top_features,
+        use_llm=not degraded,
     )
     prescription_summary = generate_prescription_summary(
         data,
         float(final_score),
         risk,
         top_features,
+        use_llm=not degraded,
     )
 
-    # Determine user identity from JWT (if provided).
-    auth_header = request.headers.get("Authorization", "")
-    user_email = None
-    if auth_header.startswith("Bearer "):
-        token = auth_header.split(" ", 1)[1].strip()
-        try:
-            payload = decode_token(token)
-            user_email = payload.get("email")
-        except Exception:
-            # If token is invalid, we still allow prediction but do not tag user.
-            user_email = None
-
     response = {
         "input": data,
         "risk_score": float(final_score),
@@ -180,51 +192,97 @@ def predict_risk():
     }
     if shap_error:
         response["shap_error"] = shap_error
+    if degraded:
+        response["degraded"] = True
 
     # Persist prediction to history collection
+    patient_id = make_patient_id(user_email, patient_name)
     try:
-        patient_id = None
-        if user_email and patient_name:
-            # Patient identity scoped per doctor
-            patient_id = f"{user_email}::{patient_name.strip().lower()}"
+        # Narrative LLM text goes to its own (compressed) collection so the
+        # predictions working set only holds the small numeric fields.
+        with timed("mongo_insert_narratives"):
+            narrative_id = save_narratives(
+                {
+                    "explanation_text": explanation_text,
+                    "lifestyle_suggestions": lifestyle_suggestions,
+                    "followup_plan": followup_plan,
+                    "prescription_summary": prescription_summary,
+                }
+            )
 
-        predictions_collection.insert_one(
-            {
-                "created_at": datetime.utcnow(),
-                "userId": user_email,
-                "doctorId": user_email,
-                "patientId": patient_id,
-                "patientName": patient_name,
-                "input": data,
-                "risk_score": float(final_score),
-                "risk_level": risk,
-                "trestbps": data.get("trestbps"),
-                "chol": data.get("chol"),
-                "thalach": data.get("thalach"),
-                "oldpeak": data.get("oldpeak"),
-                "restecg": data.get("restecg"),
-                "smoking_status": lifestyle.get("smoking_status"),
-                "diabetes_status": lifestyle.get("diabetes_status"),
-                "family_history_diabetes": lifestyle.get("family_history_diabetes"),
-                "pregnancy_status": lifestyle.get("pregnancy_status"),
-                "top_features": top_features,
-                "explanation_text": explanation_text,
-                "lifestyle_suggestions": lifestyle_suggestions,
-                "followup_plan": followup_plan,
-                "prescription_summary": prescription_summary,
-            }
-        )
+        prediction = {
+            "created_at": datetime.utcnow(),
+            "userId": user_email,
+            "doctorId": user_email,
+            "patientId": patient_id,
+            "patientName": patient_name,
+            "input": data,
+            "risk_score": float(final_score),
+            "risk_level": risk,
+            "trestbps": data.get("trestbps"),
+            "chol": data.get("chol"),
+            "thalach": data.get("thalach"),
+            "oldpeak": data.get("oldpeak"),
+            "restecg": data.get("restecg"),
+            "smoking_status": lifestyle.get("smoking_status"),
+            "diabetes_status": lifestyle.get("diabetes_status"),
+            "family_history_diabetes": lifestyle.get("family_history_diabetes"),
+            "pregnancy_status": lifestyle.get("pregnancy_status"),
+            "top_features": top_features,
+            "narrative_id": narrative_id,
+        }
+        with timed("mongo_insert"):
+            history_predictions_collection.insert_one(prediction)
+        summary = record_latest(patient_id, prediction) if patient_id else None
+        bump_versions(user_email, user_email, patient_id)
+        if summary is not None:
+            apply_update(user_email, patient_id, summary)
     except Exception:
         # Failing to write history should not break the main prediction flow
-        pass
+        record_fallback("mongo_insert", "error")
+
+    if patient_id:
+        try:
+            response["cohort"] = cohort_rank(user_email, patient_id)
+        except Exception:
+            record_fallback("cohort", "error")
+
+    return response, 200
+
+
+# Projection used by list/trend reads: everything except the narrative text.
+_COMPACT_PROJECTION = {field: 0 for field in NARRATIVE_FIELDS + ("narrative_id",)}
+
+# Fields of each history item in the patient profile.
+_PROFILE_FIELDS = (
+    "created_at",
+    "risk_score",
+    "risk_level",
+    "trestbps",
+    "chol",
+    "thalach",
+    "oldpeak",
+    "restecg",
+    "smoking_status",
+    "diabetes_status",
+    "family_history_diabetes",
+    "pregnancy_status",
+    "input",
+)
+
+
+def _wants_narratives():
+    """True if the request explicitly asked for narrative text (`?narratives=1`)."""
+    return request.args.get("narratives", "").lower() in ("1", "true", "yes")
+
 
-    return jsonify(response)
 @predict.route("/history/<user_id>", methods=["GET", "OPTIONS"])
 def get_history_for_user(user_id):
     """Return prediction history for a specific user, sorted by newest first.
 
     Uses JWT from the Authorization header to verify that the caller is the
-    same user as the requested user_id (email).
+    same user as the requested user_id (email). Narrative text is only
+    loaded when `?narratives=1` is passed.
     """
     # Let CORS preflight succeed without auth.
     if request.method == "OPTIONS":
@@ -244,19 +302,26 @@ def get_history_for_user(user_id):
     if not email or email != user_id:
         return jsonify({"msg": "Forbidden"}), 403
 
+    include_narratives = _wants_narratives()
+
+    # Answer dashboard re-polls from the per-user change counter when possible.
+    etag, not_modified = check_not_modified(user_scope(user_id), f"n{int(include_narratives)}")
+    if not_modified is not None:
+        return not_modified
+
     try:
+        projection = None if include_narratives else _COMPACT_PROJECTION
         cursor = (
-            predictions_collection.find({"userId": user_id})
+            reads(predictions_collection).find({"userId": user_id}, projection)
             .sort("created_at", -1)
         )
         history = []
         for doc in cursor:
-            doc["id"] = str(doc.pop("_id", ""))
-            created_at = doc.get("created_at")
-            if hasattr(created_at, "isoformat"):
-                doc["created_at"] = created_at.isoformat()
+            doc["id"] = doc.pop("_id", "")
             history.append(doc)
-        return jsonify({"items": history})
+        if include_narratives:
+            attach_narratives(history)
+        return with_etag(jsonify({"items": history}), etag)
     except Exception as e:
         return jsonify({"msg": "Failed to load history", "error": str(e)}), 500
 
@@ -285,6 +350,10 @@ def get_doctor_patients():
     if role != "Doctor":
         return jsonify({"msg": "Forbidden"}), 403
 
+    etag, not_modified = check_not_modified(doctor_scope(email))
+    if not_modified is not None:
+        return not_modified
+
     try:
         pipeline = [
             {"$match": {"doctorId": email, "patientId": {"$ne": None}}},
@@ -297,27 +366,78 @@ def get_doctor_patients():
                 }
             },
             {"$sort": {"lastVisit": -1}},
-        ]
-        cursor = predictions_collection.aggregate(pipeline)
-        patients = []
-        for doc in cursor:
-            last_visit = doc.get("lastVisit")
-            patients.append(
-                {
-                    "patientId": doc.get("_id"),
-                    "patientName": doc.get("patientName"),
-                    "lastVisit": last_visit.isoformat() if hasattr(last_visit, "isoformat") else None,
-                    "assessmentCount": doc.get("assessmentCount", 0),
+            {
+                "$project": {
+                    "_id": 0,
+                    "patientId": "$_id",
+                    "patientName": 1,
+                    "lastVisit": 1,
+                    "assessmentCount": 1,
                 }
-            )
-        return jsonify({"patients": patients})
+            },
+        ]
+        patients = reads(predictions_collection).aggregate(pipeline)
+        return with_etag(jsonify({"patients": patients}), etag)
     except Exception as e:
         return jsonify({"msg": "Failed to load patients", "error": str(e)}), 500
 
 
+# Upper bound for `limit` on patient search.
+_SEARCH_MAX_LIMIT = 50
+
+
+@predict.route("/doctor/patients/search", methods=["GET"])
+def search_doctor_patients():
+    """Autocomplete the logged-in doctor's patients by name.
+
+    `?q=` is matched case- and accent-insensitively as a name prefix or as
+    word prefixes; `?limit=` caps the results (default 10, max 50).
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return jsonify({"msg": "Authorization header missing"}), 401
+
+    token = auth_header.split(" ", 1)[1].strip()
+    try:
+        payload = decode_token(token)
+    except Exception as e:
+        return jsonify({"msg": "Invalid token", "error": str(e)}), 401
+
+    email = payload.get("email")
+    role = payload.get("role", "Doctor")
+    if not email:
+        return jsonify({"msg": "Unauthorized"}), 401
+    if role != "Doctor":
+        return jsonify({"msg": "Forbidden"}), 403
+
+    query = request.args.get("q", "")
+    try:
+        limit = min(int(request.args.get("limit", 10)), _SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"msg": "Invalid limit"}), 400
+
+    etag, not_modified = check_not_modified(doctor_scope(email), f"search|{query}|{limit}")
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        with timed("patient_search"):
+            patients = search_patients(email, query, limit)
+        for doc in patients:
+            doc["patientId"] = doc.pop("_id")
+        return with_etag(jsonify({"patients": patients}), etag)
+    except Exception as e:
+        return jsonify({"msg": "Failed to search patients", "error": str(e)}), 500
+
+
 @predict.route("/doctor/patient/<patient_id>", methods=["GET"])
 def get_doctor_patient_profile(patient_id):
-    """Return full prediction history for a specific patient of the doctor."""
+    """Return full prediction history for a specific patient of the doctor.
+
+    Narrative text is only loaded when `?narratives=1` is passed; predictions
+    moved to cold storage by the retention job are appended with
+    `?include_archived=1`.
+    """
     auth_header = request.headers.get("Authorization", "")
     if not auth_header.startswith("Bearer "):
         return jsonify({"msg": "Authorization header missing"}), 401
@@ -335,54 +455,89 @@ def get_doctor_patient_profile(patient_id):
     if role != "Doctor":
         return jsonify({"msg": "Forbidden"}), 403
 
+    include_narratives = _wants_narratives()
+    include_archived = request.args.get("include_archived", "").lower() in ("1", "true", "yes")
+
+    # patientId embeds the doctor's email, but keep the validator per doctor too
+    # so one doctor can never revalidate against another's resource. The cohort
+    # ranking changes with any patient of the doctor, hence the doctor version.
+    etag, not_modified = check_not_modified(
+        patient_scope(patient_id),
+        f"{email}|n{int(include_narratives)}|a{int(include_archived)}"
+        f"|c{current_version(doctor_scope(email))}",
+    )
+    if not_modified is not None:
+        return not_modified
+
     try:
+        fields = _PROFILE_FIELDS + (("narrative_id",) + NARRATIVE_FIELDS if include_narratives else ())
         cursor = (
-            predictions_collection.find({"doctorId": email, "patientId": patient_id})
+            reads(predictions_collection)
+            .find(
+                {"doctorId": email, "patientId": patient_id},
+                {field: 1 for field in fields + ("patientName",)},
+            )
             .sort("created_at", -1)
         )
+        if include_archived:
+            # Archived predictions are all older than the hot ones, so the
+            # combined sequence stays newest first.
+            cursor = itertools.chain(
+                cursor,
+                load_archived_history(
+                    email, patient_id, include_narratives, fields=fields + ("patientName",)
+                ),
+            )
         history = []
         first_visit = None
         last_visit = None
         patient_name = None
+        # Documents are returned as projected; the JSON provider encodes
+        # ObjectId and datetime values. Missing fields are filled in so every
+        # item has the same keys (older documents lack some of them).
         for doc in cursor:
+            doc["id"] = doc.pop("_id", None)
+            doc.setdefault("input", {})
+            for field in _PROFILE_FIELDS:
+                doc.setdefault(field, None)
+            name = doc.pop("patientName", None)
             if patient_name is None:
-                patient_name = doc.get("patientName")
+                patient_name = name
             created_at = doc.get("created_at")
             if created_at is not None:
                 if last_visit is None:
                     last_visit = created_at
                 first_visit = created_at if first_visit is None else min(first_visit, created_at)
-            item = {
-                "id": str(doc.get("_id")),
-                "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else None,
-                "risk_score": doc.get("risk_score"),
-                "risk_level": doc.get("risk_level"),
-                "trestbps": doc.get("trestbps"),
-                "chol": doc.get("chol"),
-                "thalach": doc.get("thalach"),
-                "oldpeak": doc.get("oldpeak"),
-                "restecg": doc.get("restecg"),
-                "smoking_status": doc.get("smoking_status"),
-                "diabetes_status": doc.get("diabetes_status"),
-                "family_history_diabetes": doc.get("family_history_diabetes"),
-                "pregnancy_status": doc.get("pregnancy_status"),
-                "input": doc.get("input", {}),
-            }
-            history.append(item)
+            if doc.pop("archived_at", None) is not None:
+                doc["archived"] = True
+            history.append(doc)
+
+        if include_narratives:
+            attach_narratives(history)
+
+        try:
+            cohort = cohort_rank(email, patient_id)
+        except Exception:
+            cohort = None
+            record_fallback("cohort", "error")
 
         stats = {
             "assessmentCount": len(history),
-            "firstVisit": first_visit.isoformat() if hasattr(first_visit, "isoformat") else None,
-            "lastVisit": last_visit.isoformat() if hasattr(last_visit, "isoformat") else None,
+            "firstVisit": first_visit,
+            "lastVisit": last_visit,
         }
 
-        return jsonify(
-            {
-                "patientId": patient_id,
-                "patientName": patient_name,
-                "stats": stats,
-                "history": history,
-            }
+        return with_etag(
+            jsonify(
+                {
+                    "patientId": patient_id,
+                    "patientName": patient_name,
+                    "stats": stats,
+                    "cohort": cohort,
+                    "history": history,
+                }
+            ),
+            etag,
         )
     except Exception as e:
         return jsonify({"msg": "Failed to load patient profile", "error": str(e)}), 500
@@ -417,9 +572,18 @@ def delete_history_item(item_id):
         return jsonify({"msg": "Invalid id"}), 400
 
     try:
-        res = predictions_collection.delete_one({"_id": oid, "userId": email})
-        if res.deleted_count == 0:
+        doc = predictions_collection.find_one_and_delete(
+            {"_id": oid, "userId": email},
+            projection={"narrative_id": 1, "doctorId": 1, "patientId": 1},
+        )
+        if doc is None:
             return jsonify({"msg": "Item not found"}), 404
+        delete_narratives(doc.get("narrative_id"))
+        doctor_id, patient_id = doc.get("doctorId"), doc.get("patientId")
+        summary = refresh_patient(doctor_id, patient_id) if doctor_id and patient_id else None
+        bump_versions(email, doctor_id, patient_id)
+        if doctor_id and patient_id:
+            apply_update(doctor_id, patient_id, summary)
         return jsonify({"msg": "Deleted"})
     except Exception as e:
         return jsonify({"msg": "Failed to delete history item", "error": str(e)}), 500
@@ -0,0 +1,59 @@
+"""
+Move predictions older than the retention hot window to cold storage.
+
+Batches are written to the archive (the `predictions_archive` collection or
+gzip NDJSON files partitioned by day) before being removed from
+`predictions`. Run periodically (e.g. nightly from cron) from `backend/`:
+
+    python -m scripts.archive_predictions --hot-days 365 --target files
+"""
+import argparse
+
+from config import (
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_ARCHIVE_TARGET,
+    RETENTION_ARCHIVE_TTL_DAYS,
+    RETENTION_HOT_DAYS,
+)
+from utils.retention import archive_old_predictions, ensure_archive_ttl, ensure_hot_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hot-days", type=int, default=RETENTION_HOT_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--target", choices=["collection", "files"], default=RETENTION_ARCHIVE_TARGET)
+    parser.add_argument("--archive-dir", default=RETENTION_ARCHIVE_DIR)
+    parser.add_argument(
+        "--ttl-days",
+        type=int,
+        default=RETENTION_ARCHIVE_TTL_DAYS,
+        help="hard-expire archived data after N days (0 = keep forever)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    args = parser.parse_args()
+
+    if not args.dry_run:
+        ensure_hot_index()
+        if args.target == "collection":
+            ensure_archive_ttl(args.ttl_days)
+
+    stats = archive_old_predictions(
+        hot_days=args.hot_days,
+        batch_size=args.batch_size,
+        target=args.target,
+        archive_dir=args.archive_dir,
+        dry_run=args.dry_run,
+        ttl_days=args.ttl_days,
+    )
+    if args.dry_run:
+        print(f"Dry run: {stats['archived']} predictions are older than {args.hot_days} days")
+    else:
+        print(
+            f"Archived {stats['archived']} predictions in {stats['batches']} batches"
+            f" to {args.target}; expired {stats['expired_partitions']} partitions"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Move inline narrative text out of existing `predictions` documents.
+
+Each legacy document's `explanation_text`, `lifestyle_suggestions`,
+`followup_plan` and `prescription_summary` are compressed into
+`prediction_narratives` and replaced by a `narrative_id` reference.
+
+Run from `backend/`:
+
+    python -m scripts.migrate_narratives --batch-size 500
+"""
+import argparse
+
+from pymongo import UpdateOne
+
+from database.mongo import narratives_collection, predictions_collection
+from utils.narratives import NARRATIVE_FIELDS, build_narrative_document
+
+
+def _legacy_query(after_id=None):
+    query = {
+        "narrative_id": {"$exists": False},
+        "$or": [{field: {"$exists": True}} for field in NARRATIVE_FIELDS],
+    }
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return query
+
+
+def migrate(batch_size=500, limit=None, dry_run=False):
+    """Convert legacy documents in batches. Returns the number converted."""
+    projection = {field: 1 for field in NARRATIVE_FIELDS}
+    converted = 0
+    last_id = None
+    while limit is None or converted < limit:
+        size = batch_size if limit is None else min(batch_size, limit - converted)
+        # Re-query each round so the cursor never has to stay open across
+        # batches, resuming after the last _id seen: the _id index then skips
+        # everything already converted instead of rescanning it.
+        docs = list(
+            predictions_collection.find(_legacy_query(last_id), projection)
+            .sort("_id", 1)
+            .limit(size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        if dry_run:
+            converted += len(docs)
+            break
+
+        narrative_docs = [build_narrative_document(doc) for doc in docs]
+        res = narratives_collection.insert_many(narrative_docs, ordered=True)
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {"narrative_id": nid},
+                    "$unset": {field: "" for field in NARRATIVE_FIELDS},
+                },
+            )
+            for doc, nid in zip(docs, res.inserted_ids)
+        ]
+        predictions_collection.bulk_write(ops, ordered=False)
+        converted += len(docs)
+        print(f"Converted {converted} documents")
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=None, help="stop after N documents")
+    parser.add_argument("--dry-run", action="store_true", help="only report the first batch")
+    args = parser.parse_args()
+
+    total = migrate(batch_size=args.batch_size, limit=args.limit, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Dry run: at least {total} documents would be converted")
+    else:
+        print(f"Done. {total} documents converted")
+
+
+if __name__ == "__main__":
+    main()
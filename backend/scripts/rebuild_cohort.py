@@ -0,0 +1,36 @@
+"""
+Rebuild the per-patient `patients` summaries behind cohort ranking.
+
+Needed once for predictions stored before the summaries existed, after a
+change to how names are normalized for search, or after editing
+`predictions` by hand. Each affected doctor's version counter is
+bumped so every worker reloads its cached panel on the next read.
+
+Run from `backend/`:
+
+    python -m scripts.rebuild_cohort [--doctor doctor@example.com]
+"""
+import argparse
+
+from utils.etag import bump_versions
+from utils.patients import rebuild_patients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--doctor", help="only rebuild this doctor's panel (default: all)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    counts = rebuild_patients(args.doctor, batch_size=args.batch_size)
+    doctors = set(counts)
+    if args.doctor:
+        doctors.add(args.doctor)
+    for doctor in doctors:
+        bump_versions(None, doctor, None)
+    rebuilt = sum(1 for count in counts.values() if count)
+    print(f"Rebuilt {sum(counts.values())} patient summaries for {rebuilt} doctors")
+
+
+if __name__ == "__main__":
+    main()
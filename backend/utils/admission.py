@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Blueprint, g, jsonify, request
+
+from config import (
+    ADMISSION_DEGRADE_AT,
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_INFLIGHT_PREDICT,
+    ADMISSION_MAX_INFLIGHT_READ,
+    RATE_LIMIT_PREDICT_BURST,
+    RATE_LIMIT_PREDICT_PER_MIN,
+    RATE_LIMIT_READ_BURST,
+    RATE_LIMIT_READ_PER_MIN,
+)
+from utils.metrics import counter, gauge
+from utils.token import decode_token
+
+admission = Blueprint("admission", __name__)
+
+# Endpoint -> class. Cheap reads are kept apart from the expensive /predict
+# so a burst of predictions cannot starve the dashboard (and vice versa).
+# Endpoints not listed here (auth, /metrics, /) are not limited.
+ENDPOINT_CLASSES = {
+    "predict.predict_risk": "predict",
+    "predict.get_history_for_user": "read",
+    "predict.get_doctor_patients": "read",
+    "predict.search_doctor_patients": "read",
+    "predict.get_doctor_patient_profile": "read",
+    "predict.delete_history_item": "read",
+    "export.export_doctor_predictions": "read",
+}
+
+# Most distinct callers tracked at once; least recently seen buckets are evicted.
+_MAX_BUCKETS = 10000
+
+INFLIGHT = gauge("cardionova_admission_inflight", "Requests currently admitted, by endpoint class.")
+LIMITS = gauge("cardionova_admission_limit", "Configured in-flight limit, by endpoint class.")
+REJECTIONS = counter(
+    "cardionova_admission_rejections_total",
+    "Requests rejected by admission control, by endpoint class and reason.",
+)
+DEGRADED = counter(
+    "cardionova_admission_degraded_total",
+    "/predict requests served without the LLM sections because of load.",
+)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consume one token. Returns (allowed, seconds until one is available)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+        return False, (1.0 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def refund(self):
+        """Give back a token taken for a request that was not served."""
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+
+
+class EndpointClass:
+    """In-flight limit plus per-caller token buckets for one endpoint class."""
+
+    def __init__(self, name, max_inflight, per_minute, burst):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.inflight = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        LIMITS.set(max_inflight, **{"class": name})
+
+    def try_acquire(self):
+        with self._lock:
+            if self.inflight >= self.max_inflight:
+                return False
+            self.inflight += 1
+        INFLIGHT.inc(**{"class": self.name})
+        return True
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+        INFLIGHT.dec(**{"class": self.name})
+
+    def load(self):
+        """Fraction of in-flight slots currently in use."""
+        return self.inflight / self.max_inflight if self.max_inflight else 1.0
+
+    def take_token(self, key):
+        if self.burst <= 0:
+            return True, 0.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > _MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take()
+
+    def refund_token(self, key):
+        if self.burst <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.refund()
+
+
+CLASSES = {
+    "predict": EndpointClass(
+        "predict", ADMISSION_MAX_INFLIGHT_PREDICT, RATE_LIMIT_PREDICT_PER_MIN, RATE_LIMIT_PREDICT_BURST
+    ),
+    "read": EndpointClass(
+        "read", ADMISSION_MAX_INFLIGHT_READ, RATE_LIMIT_READ_PER_MIN, RATE_LIMIT_READ_BURST
+    ),
+}
+
+
+def _caller_key():
+    """Rate-limit key: the JWT email if the token is valid, else the client IP.
+
+    `decode_token` keeps the payload for the rest of the request, so the
+    route does not decode the token again.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            email = decode_token(auth_header.split(" ", 1)[1].strip()).get("email")
+            if email:
+                return f"user:{email}"
+        except Exception:
+            pass
+    return f"ip:{request.remote_addr}"
+
+
+def _reject(status, msg, cls, reason, retry_after):
+    REJECTIONS.inc(**{"class": cls.name, "reason": reason})
+    resp = jsonify({"msg": msg, "error": f"{cls.name} {reason}"})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return resp
+
+
+@admission.before_app_request
+def _admit():
+    if not ADMISSION_ENABLED or request.method == "OPTIONS":
+        return None
+    cls = CLASSES.get(ENDPOINT_CLASSES.get(request.endpoint))
+    if cls is None:
+        return None
+
+    key = _caller_key()
+    allowed, retry_after = cls.take_token(key)
+    if not allowed:
+        return _reject(429, "Too many requests", cls, "rate_limited", retry_after)
+
+    if not cls.try_acquire():
+        # Not served, so it should not count against the caller's rate.
+        cls.refund_token(key)
+        return _reject(503, "Server busy, please retry", cls, "overloaded", 1)
+    g._admission_class = cls
+    return None
+
+
+@admission.teardown_app_request
+def _release(exc=None):
+    cls = g.pop("_admission_class", None)
+    if cls is not None:
+        cls.release()
+
+
+def should_degrade():
+    """True if the current /predict should skip the LLM sections.
+
+    Degrades once ADMISSION_DEGRADE_AT of the /predict slots are busy, so the
+    risk score still comes back quickly under pressure.
+    """
+    cls = g.get("_admission_class")
+    if cls is None or cls.name != "predict" or ADMISSION_DEGRADE_AT <= 0:
+        return False
+    if cls.load() >= ADMISSION_DEGRADE_AT:
+        DEGRADED.inc()
+        return True
+    return False
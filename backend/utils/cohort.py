@@ -0,0 +1,188 @@
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from database.mongo import patients_collection
+from utils.etag import current_version, doctor_scope
+from utils.metrics import counter, timed
+
+# Per-doctor panel of each patient's latest risk score, kept as a sorted list
+# so a percentile is two bisects. Every worker holds its own copy, tagged
+# with the doctor's `resource_versions` counter. A local write that is the
+# only change since the copy was synced is applied in place. Otherwise (for
+# example another worker's write) the next read fetches just the summaries
+# changed since the last sync, via the (doctorId, updated_at) index. Only
+# when patients have left the panel (delete, archive, rebuild) is the whole
+# panel reloaded.
+
+RISK_LEVELS = ("Low", "Moderate", "High")
+
+# Most doctor panels cached per process; least recently used are evicted.
+_MAX_PANELS = 1000
+
+# Summaries are stamped with the writing worker's clock; look back this much
+# further when catching up so small clock differences cannot hide a write.
+_SYNC_SKEW = timedelta(seconds=30)
+
+_FIELDS = {"risk_score": 1, "risk_level": 1}
+
+LOADS = counter(
+    "cardionova_cohort_loads_total",
+    "Doctor panels loaded from the patients collection (kind=full or delta).",
+)
+
+
+class Cohort:
+    """Latest scores of one doctor's patients, sorted for rank queries."""
+
+    def __init__(self, version: Optional[int], synced_at: Optional[datetime] = None):
+        self.version = version
+        self.synced_at = synced_at
+        self.scores = []
+        self.latest: Dict[str, tuple] = {}
+        self.buckets = {level: 0 for level in RISK_LEVELS}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def fill(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Load an empty panel from summaries, sorting the scores once."""
+        for doc in docs:
+            if doc.get("risk_score") is not None:
+                level = doc.get("risk_level")
+                self.latest[doc["_id"]] = (float(doc["risk_score"]), level)
+                if level in self.buckets:
+                    self.buckets[level] += 1
+        self.scores = sorted(score for score, _ in self.latest.values())
+
+    def set(self, patient_id: str, score: float, level: Optional[str]) -> None:
+        self.remove(patient_id)
+        bisect.insort(self.scores, score)
+        self.latest[patient_id] = (score, level)
+        if level in self.buckets:
+            self.buckets[level] += 1
+
+    def remove(self, patient_id: str) -> None:
+        previous = self.latest.pop(patient_id, None)
+        if previous is None:
+            return
+        score, level = previous
+        i = bisect.bisect_left(self.scores, score)
+        if i < len(self.scores) and self.scores[i] == score:
+            del self.scores[i]
+        if level in self.buckets:
+            self.buckets[level] -= 1
+
+    def percentile(self, score: float) -> float:
+        """Share of the panel scoring below `score`, counting ties as half."""
+        if not self.scores:
+            return 0.0
+        below = bisect.bisect_left(self.scores, score)
+        ties = bisect.bisect_right(self.scores, score) - below
+        return round(100.0 * (below + 0.5 * ties) / len(self.scores), 1)
+
+
+_panels: "OrderedDict[str, Cohort]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _load(doctor_id: str, version: Optional[int]) -> Cohort:
+    cohort = Cohort(version, datetime.utcnow())
+    with timed("cohort_load"):
+        cohort.fill(patients_collection.find({"doctorId": doctor_id}, _FIELDS))
+    LOADS.inc(kind="full")
+    return cohort
+
+
+def _catch_up(doctor_id: str, cohort: Cohort, version: Optional[int]) -> bool:
+    """Apply summaries changed since the panel was last synced.
+
+    Returns False (panel left untouched) if patients were removed meanwhile:
+    removals leave no summary behind to fetch, so the caller reloads instead.
+    """
+    synced_at = datetime.utcnow()
+    with timed("cohort_catch_up"):
+        changed = list(
+            patients_collection.find(
+                {"doctorId": doctor_id, "updated_at": {"$gte": cohort.synced_at - _SYNC_SKEW}},
+                _FIELDS,
+            )
+        )
+        size = patients_collection.count_documents(
+            {"doctorId": doctor_id, "risk_score": {"$ne": None}}
+        )
+    LOADS.inc(kind="delta")
+    with _lock:
+        if cohort.version is not None and cohort.version >= version:
+            return True  # a concurrent read already synced it further
+        ids = set(cohort.latest)
+        for doc in changed:
+            if doc.get("risk_score") is None:
+                ids.discard(doc["_id"])
+            else:
+                ids.add(doc["_id"])
+        if len(ids) != size:
+            return False
+        for doc in changed:
+            if doc.get("risk_score") is None:
+                cohort.remove(doc["_id"])
+            else:
+                cohort.set(doc["_id"], float(doc["risk_score"]), doc.get("risk_level"))
+        cohort.version = version
+        cohort.synced_at = synced_at
+    return True
+
+
+def get_cohort(doctor_id: str) -> Cohort:
+    version = current_version(doctor_scope(doctor_id))
+    with _lock:
+        cohort = _panels.get(doctor_id)
+        if cohort is not None and version is not None and cohort.version == version:
+            _panels.move_to_end(doctor_id)
+            return cohort
+    if cohort is not None and version is not None and _catch_up(doctor_id, cohort, version):
+        return cohort
+    cohort = _load(doctor_id, version)
+    with _lock:
+        _panels[doctor_id] = cohort
+        _panels.move_to_end(doctor_id)
+        while len(_panels) > _MAX_PANELS:
+            _panels.popitem(last=False)
+    return cohort
+
+
+def apply_update(doctor_id: str, patient_id: str, summary: Optional[Dict[str, Any]]) -> None:
+    """Apply a local write to the cached panel; call after `bump_versions`.
+
+    `summary` is the patient's new latest assessment, or None if they have
+    no predictions left.
+    """
+    version = current_version(doctor_scope(doctor_id))
+    with _lock:
+        cohort = _panels.get(doctor_id)
+        if cohort is None:
+            return
+        if version is None or cohort.version is None or version != cohort.version + 1:
+            # Someone else wrote too: the next read catches up from `patients`.
+            return
+        if summary is None or summary.get("risk_score") is None:
+            cohort.remove(patient_id)
+        else:
+            cohort.set(patient_id, float(summary["risk_score"]), summary.get("risk_level"))
+        cohort.version = version
+
+
+def cohort_rank(doctor_id: str, patient_id: str) -> Optional[Dict[str, Any]]:
+    """Percentile of the patient's latest score within the doctor's panel."""
+    cohort = get_cohort(doctor_id)
+    with _lock:
+        entry = cohort.latest.get(patient_id)
+        if entry is None:
+            return None
+        return {
+            "percentile": cohort.percentile(entry[0]),
+            "panelSize": len(cohort),
+            "distribution": dict(cohort.buckets),
+        }
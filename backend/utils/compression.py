@@ -0,0 +1,62 @@
+import gzip
+
+from flask import Blueprint, request
+
+from config import COMPRESS_BROTLI_QUALITY, COMPRESS_GZIP_LEVEL, COMPRESS_MIN_BYTES
+from utils.metrics import counter
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+compression = Blueprint("compression", __name__)
+
+COMPRESSED = counter(
+    "cardionova_compressed_responses_total",
+    "Responses compressed on the fly, by encoding.",
+)
+
+
+def _pick_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+@compression.after_app_request
+def _compress_response(response):
+    """Compress large JSON bodies with brotli (if installed) or gzip.
+
+    Streamed responses (e.g. /doctor/export) and bodies that already carry a
+    Content-Encoding are left alone.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype != "application/json"
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    COMPRESSED.inc(encoding=encoding)
+    return response
@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+from flask import Response, g, request
+from pymongo import UpdateOne
+
+from database.mongo import versions_collection
+from utils.metrics import counter
+
+# Each cached resource has a scope whose counter in `resource_versions` is
+# bumped on every write that can change it:
+#   user:<email>        -> /history/<email>
+#   doctor:<email>      -> /doctor/patients
+#   patient:<patientId> -> /doctor/patient/<patientId>
+# Checking a validator is then a single primary-key lookup instead of the
+# full query + serialization.
+
+NOT_MODIFIED = counter(
+    "cardionova_conditional_not_modified_total",
+    "Conditional GETs answered with 304 Not Modified, by resource kind.",
+)
+
+
+def user_scope(email: str) -> str:
+    return f"user:{email}"
+
+
+def doctor_scope(email: str) -> str:
+    return f"doctor:{email}"
+
+
+def patient_scope(patient_id: str) -> str:
+    return f"patient:{patient_id}"
+
+
+def bump_versions(user_email: Optional[str], doctor_email: Optional[str], patient_id: Optional[str]) -> None:
+    """Invalidate validators for every resource a prediction write touches.
+
+    Best-effort: a failure here only means clients re-download unchanged data.
+    """
+    scopes = []
+    if user_email:
+        scopes.append(user_scope(user_email))
+    if doctor_email:
+        scopes.append(doctor_scope(doctor_email))
+    if patient_id:
+        scopes.append(patient_scope(patient_id))
+    if not scopes:
+        return
+    now = datetime.utcnow()
+    try:
+        versions_collection.bulk_write(
+            [
+                UpdateOne({"_id": scope}, {"$inc": {"v": 1}, "$set": {"updated_at": now}}, upsert=True)
+                for scope in scopes
+            ],
+            ordered=False,
+        )
+    except Exception:
+        pass
+
+
+def _version_doc(scope: str) -> Optional[dict]:
+    try:
+        return versions_collection.find_one({"_id": scope}, {"v": 1, "updated_at": 1}) or {}
+    except Exception:
+        return None
+
+
+def current_version(scope: str) -> Optional[int]:
+    """The scope's change counter, or None if it cannot be read."""
+    doc = _version_doc(scope)
+    return None if doc is None else doc.get("v", 0)
+
+
+def _validator(scope: str, variant: str) -> Optional[str]:
+    doc = _version_doc(scope)
+    if doc is None:
+        return None
+    version = doc.get("v", 0)
+    # Lets utils/read_routing.py keep reads of just-written data on the primary.
+    g._scope_updated_at = doc.get("updated_at")
+    return hashlib.sha1(f"{scope}|{version}|{variant}".encode("utf-8")).hexdigest()[:24]
+
+
+def check_not_modified(scope: str, variant: str = "") -> Tuple[Optional[str], Optional[Response]]:
+    """Compute the validator and answer `If-None-Match` if it still matches.
+
+    Returns (etag, response): `response` is a ready 304 when the client's copy
+    is current, otherwise None and the caller builds the full response.
+    """
+    validator = _validator(scope, variant)
+    if validator is None:
+        return None, None
+    etag = f'W/"{validator}"'
+    if request.if_none_match.contains_weak(validator):
+        NOT_MODIFIED.inc(kind=scope.split(":", 1)[0])
+        resp = Response(status=304)
+        return etag, with_etag(resp, etag)
+    return etag, None
+
+
+def with_etag(response: Response, etag: Optional[str]) -> Response:
+    """Attach the validator; clients must revalidate before reusing the body."""
+    if etag is not None and response.status_code in (200, 304):
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
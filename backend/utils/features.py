@@ -0,0 +1,78 @@
+import pandas as pd
+
+from utils.metrics import timed
+
+
+def _age_group(a):
+    try:
+        a = float(a)
+    except Exception:
+        return "unknown"
+    if a < 31:
+        return "0-30"
+    if a < 46:
+        return "31-45"
+    if a < 61:
+        return "46-60"
+    return "61+"
+
+
+def _bp_cat(b):
+    try:
+        b = float(b)
+    except Exception:
+        return "unknown"
+    if b < 120:
+        return "normal"
+    if b < 130:
+        return "elevated"
+    if b < 140:
+        return "hypertension1"
+    return "hypertension2"
+
+
+def _chol_cat(c):
+    try:
+        c = float(c)
+    except Exception:
+        return "unknown"
+    if c < 200:
+        return "normal"
+    if c < 240:
+        return "borderline"
+    return "high"
+
+
+@timed("derive_features")
+def build_feature_frame(data):
+    """Build the DataFrame passed to the saved preprocessor.
+
+    `data` is a single feature dict (one row, as sent to /predict) or a list
+    of such dicts (one row each, used by the offline benchmarks).
+
+    Ensure derived/renamed columns expected by the saved preprocessor are present.
+    Some pipelines expect features like `age_group`, `bp_cat`, `chol_cat`, and a
+    misspelled `thalch` (instead of `thalach`). Create them from raw inputs when
+    possible so transform doesn't fail with missing columns.
+    """
+    if isinstance(data, dict):
+        df = pd.DataFrame({key: [value] for key, value in data.items()})
+    else:
+        df = pd.DataFrame(list(data))
+
+    if "thalach" in df.columns and "thalch" not in df.columns:
+        df["thalch"] = df["thalach"]
+
+    # age_group from `age` (simple binning that matches typical pipelines)
+    if "age" in df.columns and "age_group" not in df.columns:
+        df["age_group"] = df["age"].apply(_age_group)
+
+    # bp_cat from `trestbps`
+    if "trestbps" in df.columns and "bp_cat" not in df.columns:
+        df["bp_cat"] = df["trestbps"].apply(_bp_cat)
+
+    # chol_cat from `chol`
+    if "chol" in df.columns and "chol_cat" not in df.columns:
+        df["chol_cat"] = df["chol"].apply(_chol_cat)
+
+    return df
@@ -3,6 +3,9 @@ from typing import Any, Dict, List
 
 import google.generativeai as genai
 
+from utils.metrics import timed, record_error, record_fallback
+from utils.prompt_builder import encode_inputs, encode_top_features, finalize_prompt
+
 
 _API_KEY_ENV = "GEMINI_API_KEY"
 _MODEL_NAME = "gemini-2.5-flash"
@@ -20,6 +23,21 @@ def _get_client() -> bool:
     return True
 
 
+def _skip_llm(stage: str, use_llm: bool) -> bool:
+    """Return True (and count the fallback) if Gemini should not be called.
+
+    `use_llm=False` is passed by the route when admission control is shedding
+    load, so only the template text is returned.
+    """
+    if not use_llm:
+        record_fallback(stage, "degraded")
+        return True
+    if not _get_client():
+        record_fallback(stage, "not_configured")
+        return True
+    return False
+
+
 def _basic_explanation_fallback(risk_level: str, risk_score: float) -> str:
     return (
         f"Your predicted heart disease risk is {risk_level} "
@@ -52,22 +70,26 @@ def _basic_lifestyle_fallback(risk_level: str) -> List[str]:
     return base
 
 
+@timed("gemini_explanation")
 def generate_explanation(
     inputs: Dict[str, Any],
     risk_score: float,
     risk_level: str,
     top_features: List[Dict[str, Any]],
     language: str = "en",
+    use_llm: bool = True,
 ) -> str:
     """Return a natural-language explanation of the prediction using Gemini.
 
     Falls back to a simple template if the API key is not configured or if
     the Gemini call fails.
     """
-    if not _get_client():
+    if _skip_llm("gemini_explanation", use_llm):
         return _basic_explanation_fallback(risk_level, risk_score)
 
-    prompt = f"""
+    prompt = finalize_prompt(
+        "gemini_explanation",
+        f"""
     You are helping to explain the output of a heart-disease risk prediction
     tool. The tool is not a diagnostic system and must not give medical
     advice. Explain the result in clear, simple language (about 3–5
@@ -81,11 +103,12 @@ def generate_explanation(
 
     Language: {language}
 
-    Inputs (key=value): {inputs}
-    Risk score (0–1): {risk_score:.3f}
+    Patient data: {encode_inputs(inputs)}
+    Risk score (0–1): {risk_score:.2f}
     Risk level: {risk_level}
-    Top contributing features (name, shap_value): {top_features}
-    """.strip()
+    Top contributing features (SHAP impact): {encode_top_features(top_features)}
+    """,
+    )
 
     try:
         model = genai.GenerativeModel(_MODEL_NAME)
@@ -95,18 +118,23 @@ def generate_explanation(
         )
         text = text.strip() if text else ""
         if not text:
+            record_fallback("gemini_explanation", "empty")
             return _basic_explanation_fallback(risk_level, risk_score)
         return text
     except Exception:
+        record_error("gemini_explanation")
+        record_fallback("gemini_explanation", "error")
         return _basic_explanation_fallback(risk_level, risk_score)
 
 
+@timed("gemini_lifestyle")
 def generate_lifestyle_suggestions(
     inputs: Dict[str, Any],
     risk_score: float,
     risk_level: str,
     top_features: List[Dict[str, Any]],
     language: str = "en",
+    use_llm: bool = True,
 ) -> List[str]:
     """Return a list of high-level lifestyle suggestions using Gemini.
 
@@ -114,10 +142,12 @@ def generate_lifestyle_suggestions(
     medical advice. Falls back to a small rule-based template if Gemini is
     unavailable.
     """
-    if not _get_client():
+    if _skip_llm("gemini_lifestyle", use_llm):
         return _basic_lifestyle_fallback(risk_level)
 
-    prompt = f"""
+    prompt = finalize_prompt(
+        "gemini_lifestyle",
+        f"""
     You are assisting with a heart-health education tool. Based on the
     following estimated risk and risk factors, provide 3–5 short,
     high-level lifestyle suggestions that a person could discuss with a
@@ -134,11 +164,12 @@ def generate_lifestyle_suggestions(
 
     Language: {language}
 
-    Inputs (key=value): {inputs}
-    Risk score (0–1): {risk_score:.3f}
+    Patient data: {encode_inputs(inputs)}
+    Risk score (0–1): {risk_score:.2f}
     Risk level: {risk_level}
-    Top contributing features (name, shap_value): {top_features}
-    """.strip()
+    Top contributing features (SHAP impact): {encode_top_features(top_features)}
+    """,
+    )
 
     try:
         model = genai.GenerativeModel(_MODEL_NAME)
@@ -146,17 +177,24 @@ def generate_lifestyle_suggestions(
         text = getattr(resp, "text", "") or ""
         lines = [ln.strip("- ").strip() for ln in text.splitlines() if ln.strip()]
         cleaned = [ln for ln in lines if ln]
-        return cleaned or _basic_lifestyle_fallback(risk_level)
+        if not cleaned:
+            record_fallback("gemini_lifestyle", "empty")
+            return _basic_lifestyle_fallback(risk_level)
+        return cleaned
     except Exception:
+        record_error("gemini_lifestyle")
+        record_fallback("gemini_lifestyle", "error")
         return _basic_lifestyle_fallback(risk_level)
 
 
+@timed("gemini_followup")
 def generate_followup_plan(
     inputs: Dict[str, Any],
     risk_score: float,
     risk_level: str,
     top_features: List[Dict[str, Any]],
     language: str = "en",
+    use_llm: bool = True,
 ) -> str:
     """Return a short, non-medical follow-up plan to discuss with a doctor.
 
@@ -164,7 +202,7 @@ def generate_followup_plan(
     topics to review, and generic next steps to consider with a clinician.
     Falls back to a simple template if Gemini is unavailable.
     """
-    if not _get_client():
+    if _skip_llm("gemini_followup", use_llm):
         return (
             "Consider scheduling an appointment with a qualified healthcare "
             "professional to review your blood pressure, cholesterol, "
@@ -172,7 +210,9 @@ def generate_followup_plan(
             "ask what additional tests or monitoring they recommend."
         )
 
-    prompt = f"""
+    prompt = finalize_prompt(
+        "gemini_followup",
+        f"""
     You are assisting with a heart-health education tool. Based on the
     estimated risk and contributing factors, write a brief follow-up plan
     that a person could discuss with a qualified healthcare professional.
@@ -191,11 +231,12 @@ def generate_followup_plan(
     - Do NOT claim to diagnose or cure any disease.
     - Do NOT instruct the user to start or stop medications.
 
-    Inputs (key=value): {inputs}
-    Risk score (0–1): {risk_score:.3f}
+    Patient data: {encode_inputs(inputs)}
+    Risk score (0–1): {risk_score:.2f}
     Risk level: {risk_level}
-    Top contributing features (name, shap_value): {top_features}
-    """.strip()
+    Top contributing features (SHAP impact): {encode_top_features(top_features)}
+    """,
+    )
 
     try:
         model = genai.GenerativeModel(_MODEL_NAME)
@@ -203,6 +244,7 @@ def generate_followup_plan(
         text = getattr(resp, "text", "") or ""
         text = text.strip()
         if not text:
+            record_fallback("gemini_followup", "empty")
             return (
                 "Consider discussing this assessment with a doctor, asking "
                 "about further evaluation, lifestyle options, and how often "
@@ -210,6 +252,8 @@ def generate_followup_plan(
             )
         return text
     except Exception:
+        record_error("gemini_followup")
+        record_fallback("gemini_followup", "error")
         return (
             "Consider scheduling an appointment with a qualified healthcare "
             "professional to review your results, ask about further tests, "
@@ -217,12 +261,14 @@ def generate_followup_plan(
         )
 
 
+@timed("gemini_prescription")
 def generate_prescription_summary(
     inputs: Dict[str, Any],
     risk_score: float,
     risk_level: str,
     top_features: List[Dict[str, Any]],
     language: str = "en",
+    use_llm: bool = True,
 ) -> str:
     """Return a structured, prescription-style summary for doctor review.
 
@@ -231,7 +277,7 @@ def generate_prescription_summary(
     lifestyle themes, follow-up evaluations, and safety reminders that a
     doctor could review with the patient.
     """
-    if not _get_client():
+    if _skip_llm("gemini_prescription", use_llm):
         return (
             "This summary is intended to help structure a discussion with "
             "a qualified healthcare professional. It does not recommend "
@@ -239,10 +285,9 @@ def generate_prescription_summary(
             "any treatment decisions."
         )
 
-    # Format inputs as key=value lines to keep the prompt general.
-    kv_pairs = ", ".join(f"{k}={v}" for k, v in inputs.items())
-
-    prompt = f"""
+    prompt = finalize_prompt(
+        "gemini_prescription",
+        f"""
     You are helping with a heart-health education tool. Based on the
     following patient data and estimated risk, write a brief, structured
     summary that a DOCTOR could use as a starting point for their own
@@ -256,10 +301,10 @@ def generate_prescription_summary(
     - Keep all content as general topics or areas for the doctor to
       consider and discuss.
 
-    Patient inputs (key=value): {kv_pairs}
-    Estimated heart disease risk (0–1): {risk_score:.3f}
+    Patient data: {encode_inputs(inputs)}
+    Estimated heart disease risk (0–1): {risk_score:.2f}
     Risk level: {risk_level}
-    Top contributing model features: {top_features}
+    Top contributing model features: {encode_top_features(top_features)}
 
     Write the summary in {language} with the following sections:
 
@@ -277,7 +322,8 @@ def generate_prescription_summary(
     4) Safety reminder for the patient
        - Short paragraph reinforcing that only their own doctor can
          prescribe medication, decide on doses, or choose treatment.
-    """.strip()
+    """,
+    )
 
     try:
         model = genai.GenerativeModel(_MODEL_NAME)
@@ -285,6 +331,7 @@ def generate_prescription_summary(
         text = getattr(resp, "text", "") or ""
         text = text.strip()
         if not text:
+            record_fallback("gemini_prescription", "empty")
             return (
                 "Discuss these results with a qualified doctor, who can "
                 "review risk factors, advise on lifestyle, and decide if "
@@ -292,6 +339,8 @@ def generate_prescription_summary(
             )
         return text
     except Exception:
+        record_error("gemini_prescription")
+        record_fallback("gemini_prescription", "error")
         return (
             "This high-level summary is intended for discussion with a "
             "healthcare professional and does not include medication names "
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import (
+    IDEMPOTENCY_AUTO_WINDOW_S,
+    IDEMPOTENCY_BACKEND,
+    IDEMPOTENCY_KEY_TTL_S,
+    IDEMPOTENCY_MEMORY_MAX,
+    IDEMPOTENCY_WAIT_S,
+)
+from database.mongo import idempotency_collection
+from utils.metrics import counter
+
+OUTCOMES = counter(
+    "cardionova_idempotency_total",
+    "/predict idempotency outcomes (computed, replayed, waited, conflict).",
+)
+
+# Poll interval while waiting on a computation owned by another worker.
+_POLL_S = 0.05
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def request_key(
+    header_key: Optional[str],
+    caller: str,
+    patient_name: Optional[str],
+    features: Dict[str, Any],
+    lifestyle: Dict[str, Any],
+) -> Tuple[str, int, str]:
+    """Return (key, ttl_seconds, fingerprint) for a /predict request.
+
+    An explicit `Idempotency-Key` header is scoped to the caller and kept for
+    IDEMPOTENCY_KEY_TTL_S. Without one, the key is a hash of the caller,
+    patient and canonical inputs, kept for IDEMPOTENCY_AUTO_WINDOW_S so that
+    double-clicks and network retries collapse. The fingerprint detects a
+    header key being reused for a different request.
+    """
+    fingerprint = _digest(
+        caller,
+        (patient_name or "").strip().lower(),
+        _canonical(features),
+        _canonical(lifestyle),
+    )
+    if header_key:
+        return _digest("header", caller, header_key.strip()), IDEMPOTENCY_KEY_TTL_S, fingerprint
+    return _digest("auto", fingerprint), IDEMPOTENCY_AUTO_WINDOW_S, fingerprint
+
+
+class MemoryStore:
+    """Per-process LRU of completed responses with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, record = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return record
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def claim(self, key: str, ttl: int) -> bool:
+        # In-process duplicates are already serialized by `_inflight`.
+        return True
+
+    def put(self, key: str, record: Dict[str, Any], ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, record)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def release(self, key: str) -> None:
+        pass
+
+
+class MongoStore:
+    """Shared store in a TTL collection, so duplicates are caught across workers.
+
+    A pending document is inserted to claim a key; other workers poll until
+    it turns into a completed one (or the claim expires).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception:
+            pass
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        doc = self.collection.find_one({"_id": key, "state": "done"})
+        if doc is None or doc.get("expires_at", datetime.max) < datetime.utcnow():
+            return None
+        return doc["record"]
+
+    def exists(self, key: str) -> bool:
+        return self.collection.find_one({"_id": key}, {"_id": 1}) is not None
+
+    def claim(self, key: str, ttl: int) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        # Drop an abandoned claim (owner crashed) so the key can be retried.
+        self.collection.delete_one({"_id": key, "state": "pending", "expires_at": {"$lt": now}})
+        try:
+            self.collection.insert_one(
+                {
+                    "_id": key,
+                    "state": "pending",
+                    "expires_at": now + timedelta(seconds=IDEMPOTENCY_WAIT_S),
+                }
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def put(self, key: str, record: Dict[str, Any], ttl: int) -> None:
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "state": "done",
+                "record": record,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+
+    def release(self, key: str) -> None:
+        self.collection.delete_one({"_id": key, "state": "pending"})
+
+
+def _create_store():
+    if IDEMPOTENCY_BACKEND == "mongo":
+        return MongoStore(idempotency_collection)
+    return MemoryStore(IDEMPOTENCY_MEMORY_MAX)
+
+
+_store = _create_store()
+
+
+class _Pending:
+    def __init__(self):
+        self.event = threading.Event()
+        self.record: Optional[Dict[str, Any]] = None
+
+
+_inflight: Dict[str, _Pending] = {}
+_inflight_lock = threading.Lock()
+
+
+def _replay(record, fingerprint, outcome):
+    if record["fingerprint"] != fingerprint:
+        OUTCOMES.inc(outcome="conflict")
+        return (
+            {"msg": "Idempotency-Key was already used for a different request"},
+            422,
+            False,
+        )
+    OUTCOMES.inc(outcome=outcome)
+    return record["body"], record["status"], True
+
+
+def _wait_for_other_worker(key: str, ttl: int) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Poll for the result of a computation claimed by another worker.
+
+    Returns (record, claimed). If the owner releases its claim (its request
+    failed), the key is claimed here so the caller computes right away
+    instead of waiting out IDEMPOTENCY_WAIT_S.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_S
+    while time.monotonic() < deadline:
+        record = _store.get(key)
+        if record is not None:
+            return record, False
+        if not _store.exists(key):
+            try:
+                if _store.claim(key, ttl):
+                    return None, True
+            except Exception:
+                return None, True
+            # Another duplicate claimed it first: wait for that one instead.
+            continue
+        time.sleep(_POLL_S)
+    return None, False
+
+
+def run_once(
+    key: str,
+    ttl: int,
+    fingerprint: str,
+    compute: Callable[[], Tuple[Dict[str, Any], int]],
+) -> Tuple[Dict[str, Any], int, bool]:
+    """Run `compute` at most once per key. Returns (body, status, replayed).
+
+    Only successful (200) results are stored, so a failed request can simply
+    be retried. If the store is unavailable the request is computed normally.
+    """
+    try:
+        record = _store.get(key)
+    except Exception:
+        record = None
+    if record is not None:
+        return _replay(record, fingerprint, "replayed")
+
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        owner = pending is None
+        if owner:
+            pending = _inflight[key] = _Pending()
+
+    if not owner:
+        pending.event.wait(IDEMPOTENCY_WAIT_S)
+        if pending.record is not None:
+            return _replay(pending.record, fingerprint, "waited")
+        # The original failed or timed out: compute this one ourselves.
+        body, status = compute()
+        OUTCOMES.inc(outcome="computed")
+        return body, status, False
+
+    claimed = False
+    try:
+        try:
+            claimed = _store.claim(key, ttl)
+        except Exception:
+            claimed = True
+        if not claimed:
+            record, claimed = _wait_for_other_worker(key, ttl)
+            if record is not None:
+                pending.record = record
+                return _replay(record, fingerprint, "waited")
+
+        body, status = compute()
+        OUTCOMES.inc(outcome="computed")
+        if status == 200:
+            record = {"fingerprint": fingerprint, "body": body, "status": status}
+            pending.record = record
+            try:
+                _store.put(key, record, ttl)
+            except Exception:
+                pass
+        return body, status, False
+    finally:
+        if claimed and pending.record is None:
+            # Failed (or raised): free the key so a retry computes again.
+            try:
+                _store.release(key)
+            except Exception:
+                pass
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        pending.event.set()
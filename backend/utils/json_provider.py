@@ -0,0 +1,71 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with the models
+    np = None
+
+# Mongo documents can be returned from routes as they come out of the driver:
+# ObjectId becomes its hex string, datetimes ISO 8601 (naive ones unchanged,
+# as `.isoformat()` did), NumPy scalars/arrays plain numbers/lists, and
+# cursors (or any other iterable) lists. orjson does this in C; without it the stdlib encoder is used
+# with the same rules.
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if np is not None:
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+    if hasattr(value, "__iter__") and not isinstance(value, (str, bytes, dict)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider used by `jsonify` and dict/list return values."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Pretty-printed output in debug mode, as with the default provider.
+            return super().response(obj)
+        return self._app.response_class(dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
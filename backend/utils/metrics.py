@@ -0,0 +1,230 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import g, has_request_context
+
+
+# Latency buckets (seconds) covering sub-millisecond model calls up to slow
+# LLM requests.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and a few additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric_cls, name: str, help_text: str, **kwargs):
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is not None:
+            return existing
+        metric = metric_cls(name, help_text, **kwargs)
+        _registry[name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str) -> Counter:
+    return _register(Counter, name, help_text)
+
+
+def gauge(name: str, help_text: str) -> Gauge:
+    return _register(Gauge, name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, help_text, buckets=buckets)
+
+
+def render_prometheus() -> str:
+    """Return all registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram(
+    "cardionova_stage_duration_seconds",
+    "Time spent in each instrumented pipeline stage.",
+)
+STAGE_ERRORS = counter(
+    "cardionova_stage_errors_total",
+    "Exceptions raised inside an instrumented stage (including ones later swallowed).",
+)
+FALLBACKS = counter(
+    "cardionova_fallbacks_total",
+    "Times a stage returned a fallback result instead of its normal output.",
+)
+
+
+def _record_server_timing(stage: str, seconds: float) -> None:
+    if not has_request_context():
+        return
+    timings = g.get("_server_timing")
+    if timings is None:
+        timings = g._server_timing = []
+    timings.append((stage, seconds))
+
+
+class timed(ContextDecorator):
+    """Time a block or function as pipeline stage `stage`.
+
+    Usable as ``with timed("preprocess"):`` or ``@timed("shap")``. The
+    duration feeds `cardionova_stage_duration_seconds`; an exception also
+    bumps `cardionova_stage_errors_total` and is re-raised unchanged.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        STAGE_SECONDS.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        _record_server_timing(self.stage, elapsed)
+        return False
+
+    def _recreate_cm(self):
+        # A fresh instance per call keeps the decorator re-entrant/thread-safe.
+        return type(self)(self.stage)
+
+
+def record_error(stage: str) -> None:
+    """Count an error that was caught and handled inside `stage`."""
+    STAGE_ERRORS.inc(stage=stage)
+
+
+def record_fallback(stage: str, reason: str) -> None:
+    """Count a fallback taken by `stage` (e.g. reason="not_configured")."""
+    FALLBACKS.inc(stage=stage, reason=reason)
+
+
+def server_timing_header() -> Optional[str]:
+    """Build a `Server-Timing` header value for the current request, if any."""
+    timings = g.get("_server_timing") if has_request_context() else None
+    if not timings:
+        return None
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings)
@@ -0,0 +1,115 @@
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary, ObjectId
+
+from config import NARRATIVE_CODEC
+from database.mongo import history_narratives_collection, narratives_collection
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+# LLM prose that used to live inline in each prediction document. These are
+# stored compressed in `prediction_narratives` and referenced by `narrative_id`.
+NARRATIVE_FIELDS = (
+    "explanation_text",
+    "lifestyle_suggestions",
+    "followup_plan",
+    "prescription_summary",
+)
+
+
+def _codec() -> str:
+    if NARRATIVE_CODEC == "zstd" and zstandard is not None:
+        return "zstd"
+    return "zlib"
+
+
+def compress_narratives(narratives: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Serialize and compress narrative fields, returning (codec, blob)."""
+    raw = json.dumps(narratives, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    codec = _codec()
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=10).compress(raw)
+    return codec, zlib.compress(raw, 9)
+
+
+def decompress_narratives(codec: str, blob: bytes) -> Dict[str, Any]:
+    """Inverse of `compress_narratives`."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(
+                "Narrative was stored with zstd; install 'zstandard' to read it."
+            )
+        raw = zstandard.ZstdDecompressor().decompress(bytes(blob))
+    else:
+        raw = zlib.decompress(bytes(blob))
+    return json.loads(raw.decode("utf-8"))
+
+
+def build_narrative_document(narratives: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a `prediction_narratives` document (without `_id`) for the fields."""
+    codec, blob = compress_narratives(
+        {k: narratives.get(k) for k in NARRATIVE_FIELDS}
+    )
+    return {"codec": codec, "data": Binary(blob)}
+
+
+def save_narratives(narratives: Dict[str, Any]) -> ObjectId:
+    """Store narrative fields compressed and return the new document id."""
+    res = history_narratives_collection.insert_one(build_narrative_document(narratives))
+    return res.inserted_id
+
+
+def split_document(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Split a prediction document into (compact fields, narrative fields)."""
+    compact = {k: v for k, v in doc.items() if k not in NARRATIVE_FIELDS}
+    narratives = {k: doc.get(k) for k in NARRATIVE_FIELDS}
+    return compact, narratives
+
+
+def load_narratives(ids: Iterable[ObjectId]) -> Dict[ObjectId, Dict[str, Any]]:
+    """Fetch and decompress narratives for the given ids in a single query."""
+    ids = [i for i in set(ids) if i is not None]
+    if not ids:
+        return {}
+    out = {}
+    for doc in narratives_collection.find({"_id": {"$in": ids}}):
+        try:
+            out[doc["_id"]] = decompress_narratives(doc.get("codec", "zlib"), doc["data"])
+        except Exception:
+            # A corrupt blob should not break the whole read path.
+            continue
+    return out
+
+
+def attach_narratives(docs: List[Dict[str, Any]], fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Fill narrative fields into prediction documents in place.
+
+    Documents that still carry the narrative inline (not yet migrated) are
+    left untouched. `narrative_id` is removed from every document.
+    """
+    wanted = tuple(fields) if fields is not None else NARRATIVE_FIELDS
+    loaded = load_narratives(d.get("narrative_id") for d in docs)
+    for doc in docs:
+        nid = doc.pop("narrative_id", None)
+        narratives = loaded.get(nid)
+        if narratives is None:
+            continue
+        for key in wanted:
+            doc[key] = narratives.get(key)
+    return docs
+
+
+def delete_narratives(narrative_id: Optional[ObjectId]) -> None:
+    """Best-effort removal of a narrative document."""
+    if narrative_id is None:
+        return
+    try:
+        narratives_collection.delete_one({"_id": narrative_id})
+    except Exception:
+        pass
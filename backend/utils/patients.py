@@ -0,0 +1,199 @@
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReplaceOne
+
+from database.mongo import patients_collection, predictions_collection
+from utils.read_routing import reads
+
+# `patients` holds one document per patient of a doctor, keyed by patientId,
+# with the fields of their most recent hot (unarchived) assessment. It is
+# maintained on every prediction insert, delete and archive so per-patient
+# lookups (cohort ranking, search) never have to group the whole
+# `predictions` collection. `name_norm` and `name_tokens` (case- and
+# accent-folded) back the patient search.
+
+# Latin letters that NFKD does not decompose into base letter + accent.
+_LATIN_FOLD = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ħ": "h", "ı": "i", "æ": "ae", "œ": "oe"})
+
+try:
+    patients_collection.create_index("doctorId")
+    patients_collection.create_index([("doctorId", 1), ("updated_at", 1)])
+    patients_collection.create_index([("doctorId", 1), ("name_norm", 1)])
+    patients_collection.create_index([("doctorId", 1), ("name_tokens", 1)])
+except Exception:
+    pass
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse whitespace ("  José " -> "jose").
+
+    Only accents on Latin letters are removed; combining marks of other
+    scripts (e.g. the Devanagari virama) are part of the spelling.
+    """
+    kept = []
+    latin = False
+    for c in unicodedata.normalize("NFKD", name or ""):
+        if not unicodedata.combining(c):
+            latin = unicodedata.name(c, "").startswith("LATIN ")
+        elif latin:
+            continue
+        kept.append(c)
+    folded = unicodedata.normalize("NFC", "".join(kept)).casefold().translate(_LATIN_FOLD)
+    return " ".join(folded.split())
+
+
+def name_tokens(normalized: str) -> List[str]:
+    """Words of a normalized name: runs of letters, digits and marks.
+
+    Marks count as part of a word: Indic vowel signs and viramas are marks,
+    not letters, so splitting on non-word characters would cut them apart.
+    """
+    tokens = set()
+    current: List[str] = []
+    for c in normalized + " ":
+        if unicodedata.category(c)[0] in "LMN":
+            current.append(c)
+        elif current:
+            tokens.add("".join(current))
+            current = []
+    return sorted(tokens)
+
+
+def make_patient_id(doctor_email: Optional[str], patient_name: Optional[str]) -> Optional[str]:
+    """Patient identity, scoped per doctor."""
+    if not doctor_email or not patient_name:
+        return None
+    return f"{doctor_email}::{patient_name.strip().lower()}"
+
+
+def _summary_from_prediction(doc: Dict[str, Any]) -> Dict[str, Any]:
+    name_norm = normalize_name(doc.get("patientName"))
+    return {
+        "doctorId": doc.get("doctorId"),
+        "patientName": doc.get("patientName"),
+        "name_norm": name_norm,
+        "name_tokens": name_tokens(name_norm),
+        "lastVisit": doc.get("created_at"),
+        "risk_score": doc.get("risk_score"),
+        "risk_level": doc.get("risk_level"),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def record_latest(patient_id: str, prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a just-inserted prediction as the patient's latest assessment."""
+    summary = _summary_from_prediction(prediction)
+    patients_collection.replace_one({"_id": patient_id}, summary, upsert=True)
+    return summary
+
+
+def refresh_patient(doctor_id: str, patient_id: str) -> Optional[Dict[str, Any]]:
+    """Recompute a patient's summary from `predictions` (e.g. after a delete).
+
+    Returns the new summary, or None if the patient has no predictions left.
+    """
+    latest = predictions_collection.find_one(
+        {"doctorId": doctor_id, "patientId": patient_id},
+        {field: 1 for field in ("doctorId", "patientName", "created_at", "risk_score", "risk_level")},
+        sort=[("created_at", -1)],
+    )
+    if latest is None:
+        patients_collection.delete_one({"_id": patient_id})
+        return None
+    summary = _summary_from_prediction(latest)
+    patients_collection.replace_one({"_id": patient_id}, summary, upsert=True)
+    return summary
+
+
+def rebuild_patients(doctor_id: Optional[str] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """Rebuild summaries from `predictions` for one doctor (or all).
+
+    Only hot predictions count: patients whose predictions are all archived
+    are dropped, as `archive_old_predictions` does incrementally.
+
+    Returns the number of patients per doctor, including 0 for doctors whose
+    panel was emptied, so callers can invalidate every affected panel.
+    """
+    match = {"patientId": {"$ne": None}}
+    if doctor_id:
+        match["doctorId"] = doctor_id
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1}},
+        {
+            "$group": {
+                "_id": "$patientId",
+                "doctorId": {"$first": "$doctorId"},
+                "patientName": {"$first": "$patientName"},
+                "created_at": {"$first": "$created_at"},
+                "risk_score": {"$first": "$risk_score"},
+                "risk_level": {"$first": "$risk_level"},
+            }
+        },
+    ]
+    # Every summary written below gets a newer `updated_at` than this, so the
+    # ones left older afterwards have no predictions. (Matching them by a
+    # `$nin` of all rebuilt ids would not fit in one BSON document.)
+    started = datetime.utcnow()
+    counts: Dict[str, int] = {}
+    ops = []
+    for doc in predictions_collection.aggregate(pipeline, allowDiskUse=True):
+        ops.append(ReplaceOne({"_id": doc["_id"]}, _summary_from_prediction(doc), upsert=True))
+        counts[doc["doctorId"]] = counts.get(doc["doctorId"], 0) + 1
+        if len(ops) >= batch_size:
+            patients_collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        patients_collection.bulk_write(ops, ordered=False)
+
+    # Drop summaries whose predictions are all gone.
+    stale = {"updated_at": {"$lt": started}}
+    if doctor_id:
+        stale["doctorId"] = doctor_id
+    for stale_doctor in patients_collection.distinct("doctorId", stale):
+        counts.setdefault(stale_doctor, 0)
+    patients_collection.delete_many(stale)
+    return counts
+
+
+def search_patients(doctor_id: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Find a doctor's patients by name, most recently seen first.
+
+    Names starting with the whole query rank first; then names where every
+    query word is a prefix of some word of the name ("smi jo" finds "John
+    Smith"). Both are anchored regexes on indexed fields, so they are served
+    by index range scans.
+    """
+    query_norm = normalize_name(query)
+    if not query_norm or limit <= 0:
+        return []
+    projection = {"patientName": 1, "lastVisit": 1, "risk_score": 1, "risk_level": 1}
+
+    collection = reads(patients_collection)
+    results = list(
+        collection.find(
+            {"doctorId": doctor_id, "name_norm": {"$regex": "^" + re.escape(query_norm)}},
+            projection,
+        )
+        .sort("lastVisit", -1)
+        .limit(limit)
+    )
+    tokens = name_tokens(query_norm)
+    if len(results) < limit and tokens:
+        found = [doc["_id"] for doc in results]
+        results.extend(
+            collection.find(
+                {
+                    "doctorId": doctor_id,
+                    "_id": {"$nin": found},
+                    "$and": [{"name_tokens": {"$regex": "^" + re.escape(t)}} for t in tokens],
+                },
+                projection,
+            )
+            .sort("lastVisit", -1)
+            .limit(limit - len(results))
+        )
+    return results
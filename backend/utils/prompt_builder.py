@@ -0,0 +1,130 @@
+import math
+import textwrap
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import PROMPT_ENCODING, PROMPT_FEATURES_TOKEN_BUDGET, PROMPT_INPUTS_TOKEN_BUDGET
+from utils.metrics import histogram
+
+# Clinical inputs in the order they are presented to the model, with a
+# readable label and unit. Keys not listed here (patient name, lifestyle
+# echoes, derived columns, ...) are not sent.
+INPUT_FIELDS = (
+    ("age", "Age", "y"),
+    ("sex", "Sex", ""),
+    ("cp", "Chest pain", ""),
+    ("trestbps", "Resting BP", "mmHg"),
+    ("chol", "Cholesterol", "mg/dl"),
+    ("fbs", "Fasting sugar >120", ""),
+    ("restecg", "Resting ECG", ""),
+    ("thalach", "Max heart rate", "bpm"),
+    ("exang", "Exercise angina", ""),
+    ("oldpeak", "ST depression", ""),
+    ("slope", "ST slope", ""),
+    ("ca", "Major vessels", ""),
+    ("thal", "Thalassemia", ""),
+)
+
+_VALUE_NAMES = {
+    "sex": {0: "female", 1: "male"},
+    "fbs": {0: "no", 1: "yes"},
+    "exang": {0: "no", 1: "yes"},
+}
+
+# Labels for preprocessor feature names ("num__chol", "cat__cp_typical angina").
+_FEATURE_LABELS = {key: label for key, label, _ in INPUT_FIELDS}
+_FEATURE_LABELS.update(
+    {"thalch": "Max heart rate", "age_group": "Age group", "bp_cat": "BP category", "chol_cat": "Cholesterol category"}
+)
+# One-hot encoded columns; longest first so "chol_cat" wins over a shorter prefix.
+_CATEGORICAL = sorted(
+    ("cp", "restecg", "slope", "thal", "age_group", "bp_cat", "chol_cat"), key=len, reverse=True
+)
+
+PROMPT_TOKENS = histogram(
+    "cardionova_prompt_tokens",
+    "Estimated input tokens per Gemini prompt, by stage.",
+    buckets=(64, 128, 192, 256, 384, 512, 768, 1024, 2048),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def _format_number(value: Any, digits: int = 1) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value).strip()
+    rounded = round(float(value), digits)
+    return str(int(rounded)) if rounded.is_integer() else f"{rounded:.{digits}f}"
+
+
+def _format_input(key: str, value: Any, unit: str) -> str:
+    names = _VALUE_NAMES.get(key)
+    if names is not None:
+        try:
+            return names[int(float(value))]
+        except (TypeError, ValueError, KeyError):
+            pass
+    text = _format_number(value)
+    return f"{text} {unit}" if unit else text
+
+
+def _fit_budget(items: Sequence[str], budget: int, sep: str) -> str:
+    """Join items in order, dropping trailing ones once `budget` tokens is reached."""
+    kept: List[str] = []
+    for i, item in enumerate(items):
+        candidate = sep.join(kept + [item])
+        if budget > 0 and kept and estimate_tokens(candidate) > budget:
+            return sep.join(kept) + f"{sep}(+{len(items) - i} more)"
+        kept.append(item)
+    return sep.join(kept)
+
+
+def encode_inputs(inputs: Dict[str, Any], budget: Optional[int] = None) -> str:
+    """Ordered clinical summary, e.g. "Age: 63 y; Sex: male; Chest pain: typical angina"."""
+    if PROMPT_ENCODING == "raw":
+        return str(inputs)
+    items = []
+    for key, label, unit in INPUT_FIELDS:
+        value = inputs.get(key)
+        if value is None and key == "thalach":
+            value = inputs.get("thalch")
+        if value is None or value == "":
+            continue
+        items.append(f"{label}: {_format_input(key, value, unit)}")
+    return _fit_budget(items, PROMPT_INPUTS_TOKEN_BUDGET if budget is None else budget, "; ")
+
+
+def feature_label(name: str) -> str:
+    """Readable name for a preprocessor output column."""
+    base = name.split("__", 1)[1] if "__" in name else name
+    for column in _CATEGORICAL:
+        if base.startswith(column + "_"):
+            return f"{_FEATURE_LABELS[column]} = {base[len(column) + 1:]}"
+    return _FEATURE_LABELS.get(base, base)
+
+
+def encode_top_features(top_features: List[Dict[str, Any]], budget: Optional[int] = None) -> str:
+    """Top SHAP contributions, most important first, e.g. "Cholesterol (+0.12)"."""
+    if PROMPT_ENCODING == "raw":
+        return str(top_features)
+    items = []
+    for item in top_features or []:
+        try:
+            value = f"{float(item.get('value', 0.0)):+.2f}"
+        except (TypeError, ValueError):
+            value = "?"
+        items.append(f"{feature_label(str(item.get('feature', '')))} ({value})")
+    if not items:
+        return "not available"
+    return _fit_budget(items, PROMPT_FEATURES_TOKEN_BUDGET if budget is None else budget, ", ")
+
+
+def finalize_prompt(stage: str, prompt: str) -> str:
+    """Strip template indentation and record the estimated prompt size."""
+    if PROMPT_ENCODING != "raw":
+        prompt = textwrap.dedent(prompt)
+    prompt = prompt.strip()
+    PROMPT_TOKENS.observe(estimate_tokens(prompt), stage=stage)
+    return prompt
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from flask import g, has_app_context
+from pymongo import ReadPreference
+from pymongo.read_concern import ReadConcern
+
+from config import MONGO_MAX_STALENESS_S
+from database.mongo import READ_ROUTE_CONCERN, READ_ROUTE_PREFERENCE
+from utils.metrics import counter
+
+# Dashboard reads may go to secondaries (MONGO_READ_PREFERENCE). A secondary
+# can lag by up to the max staleness, so a resource written more recently
+# than that is still read from the primary; otherwise a fresh ETag could be
+# attached to a body that does not contain the write yet. Those reads also
+# use the "local" read concern: with MONGO_READ_CONCERN=majority a write
+# acknowledged with w=1 might otherwise not be visible yet.
+
+_FRESH_WINDOW = timedelta(seconds=MONGO_MAX_STALENESS_S if MONGO_MAX_STALENESS_S > 0 else 90)
+
+ROUTED_READS = counter(
+    "cardionova_mongo_routed_reads_total",
+    "Read-route queries by the read preference used (primary, secondary).",
+)
+
+_handles = {}
+
+
+def _recently_written() -> bool:
+    if not has_app_context():
+        return False
+    updated_at = g.get("_scope_updated_at")
+    return updated_at is not None and datetime.utcnow() - updated_at < _FRESH_WINDOW
+
+
+def reads(collection):
+    """`collection` configured with the read-route preference and concern.
+
+    Call after `check_not_modified` so a recently written resource is known.
+    """
+    if _recently_written():
+        route, preference, concern = "fresh", ReadPreference.PRIMARY, ReadConcern("local")
+    else:
+        route, preference, concern = "routed", READ_ROUTE_PREFERENCE, READ_ROUTE_CONCERN
+    ROUTED_READS.inc(preference="primary" if preference == ReadPreference.PRIMARY else "secondary")
+    key = (collection.full_name, route)
+    handle = _handles.get(key)
+    if handle is None:
+        handle = _handles[key] = collection.with_options(
+            read_preference=preference, read_concern=concern
+        )
+    return handle
@@ -0,0 +1,238 @@
+import glob
+import gzip
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import json_util
+from pymongo import ReplaceOne
+
+from config import (
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_ARCHIVE_TARGET,
+    RETENTION_ARCHIVE_TTL_DAYS,
+    RETENTION_HOT_DAYS,
+)
+from database.mongo import archive_collection, narratives_collection, predictions_collection
+from utils.cohort import apply_update
+from utils.etag import bump_versions
+from utils.narratives import NARRATIVE_FIELDS, decompress_narratives
+from utils.patients import refresh_patient
+
+# Archived documents keep their original fields; the compressed narrative
+# document is embedded under "narrative" instead of being referenced by id,
+# so the hot `prediction_narratives` collection shrinks too.
+
+_JSON_OPTIONS = json_util.JSONOptions(
+    json_mode=json_util.JSONMode.RELAXED, tz_aware=False
+)
+
+
+_TTL_INDEX = "created_at_ttl"
+
+
+def hot_cutoff(now: Optional[datetime] = None, hot_days: int = RETENTION_HOT_DAYS) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(days=hot_days)
+
+
+def ensure_hot_index() -> None:
+    """Index `predictions.created_at` so archive batches are index range scans."""
+    predictions_collection.create_index("created_at")
+
+
+def ensure_archive_ttl(ttl_days: int = RETENTION_ARCHIVE_TTL_DAYS) -> None:
+    """Create, update or drop the cold collection's TTL index to match `ttl_days`.
+
+    An existing index is changed with `collMod` (re-creating it with other
+    options would fail with IndexOptionsConflict); 0 drops it.
+    """
+    existing = archive_collection.index_information().get(_TTL_INDEX)
+    if ttl_days <= 0:
+        if existing is not None:
+            archive_collection.drop_index(_TTL_INDEX)
+        return
+    seconds = ttl_days * 86400
+    if existing is None:
+        archive_collection.create_index("created_at", expireAfterSeconds=seconds, name=_TTL_INDEX)
+    elif existing.get("expireAfterSeconds") != seconds:
+        archive_collection.database.command(
+            "collMod",
+            archive_collection.name,
+            index={"name": _TTL_INDEX, "expireAfterSeconds": seconds},
+        )
+
+
+def _partition_path(created_at: datetime, archive_dir: str) -> str:
+    return os.path.join(
+        archive_dir,
+        f"{created_at:%Y}",
+        f"{created_at:%m}",
+        f"predictions-{created_at:%Y-%m-%d}.ndjson.gz",
+    )
+
+
+def _write_files(docs: List[Dict[str, Any]], archive_dir: str) -> None:
+    by_partition: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        by_partition.setdefault(_partition_path(doc["created_at"], archive_dir), []).append(doc)
+    for path, items in by_partition.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Appending adds a new gzip member; gzip.open reads members back to back.
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for doc in items:
+                f.write(json_util.dumps(doc, json_options=_JSON_OPTIONS) + "\n")
+
+
+def _write_collection(docs: List[Dict[str, Any]]) -> None:
+    # Upserts keep a re-run after a crash (archived but not yet deleted) idempotent.
+    archive_collection.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+        ordered=False,
+    )
+
+
+def _expire_files(archive_dir: str, ttl_days: int, now: datetime) -> int:
+    """Delete day partitions older than the TTL. Returns the number removed."""
+    if ttl_days <= 0:
+        return 0
+    limit = (now - timedelta(days=ttl_days)).strftime("%Y-%m-%d")
+    removed = 0
+    for path in glob.glob(os.path.join(archive_dir, "*", "*", "predictions-*.ndjson.gz")):
+        day = os.path.basename(path)[len("predictions-"):-len(".ndjson.gz")]
+        if day < limit:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def archive_old_predictions(
+    now: Optional[datetime] = None,
+    hot_days: int = RETENTION_HOT_DAYS,
+    batch_size: int = 500,
+    target: str = RETENTION_ARCHIVE_TARGET,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    dry_run: bool = False,
+    ttl_days: int = RETENTION_ARCHIVE_TTL_DAYS,
+) -> Dict[str, int]:
+    """Move predictions older than the hot window to cold storage in batches.
+
+    Each batch is written to the archive before it is deleted from
+    `predictions`, so an interruption can duplicate but never lose data.
+    For the files target, day partitions older than `ttl_days` are deleted
+    afterwards (the collection target expires through its TTL index).
+    """
+    if target not in ("collection", "files"):
+        raise ValueError(f"Unknown archive target: {target}")
+    now = now or datetime.utcnow()
+    cutoff = hot_cutoff(now, hot_days)
+    query = {"created_at": {"$lt": cutoff}}
+    stats = {"archived": 0, "batches": 0, "expired_partitions": 0}
+
+    if dry_run:
+        stats["archived"] = predictions_collection.count_documents(query)
+        return stats
+
+    while True:
+        docs = list(predictions_collection.find(query).sort("created_at", 1).limit(batch_size))
+        if not docs:
+            break
+
+        narrative_ids = [d["narrative_id"] for d in docs if d.get("narrative_id") is not None]
+        narratives = {}
+        if narrative_ids:
+            narratives = {
+                n["_id"]: {"codec": n.get("codec", "zlib"), "data": n["data"]}
+                for n in narratives_collection.find({"_id": {"$in": narrative_ids}})
+            }
+        for doc in docs:
+            nid = doc.pop("narrative_id", None)
+            if nid in narratives:
+                doc["narrative"] = narratives[nid]
+            doc["archived_at"] = now
+
+        if target == "files":
+            _write_files(docs, archive_dir)
+        else:
+            _write_collection(docs)
+
+        predictions_collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        if narrative_ids:
+            narratives_collection.delete_many({"_id": {"$in": narrative_ids}})
+
+        # A doctor's panel (patient list, search, cohort) covers hot
+        # predictions only, so archived patients' summaries are refreshed
+        # the same way as after a delete.
+        for user_id, doctor_id, patient_id in {
+            (d.get("userId"), d.get("doctorId"), d.get("patientId")) for d in docs
+        }:
+            summary = refresh_patient(doctor_id, patient_id) if doctor_id and patient_id else None
+            bump_versions(user_id, doctor_id, patient_id)
+            if doctor_id and patient_id:
+                apply_update(doctor_id, patient_id, summary)
+
+        stats["archived"] += len(docs)
+        stats["batches"] += 1
+
+    if target == "files":
+        stats["expired_partitions"] = _expire_files(archive_dir, ttl_days, now)
+    return stats
+
+
+def _expand_narrative(doc: Dict[str, Any], include_narratives: bool) -> Dict[str, Any]:
+    blob = doc.pop("narrative", None)
+    if include_narratives and blob is not None:
+        try:
+            narratives = decompress_narratives(blob.get("codec", "zlib"), blob["data"])
+        except Exception:
+            narratives = {}
+        for field in NARRATIVE_FIELDS:
+            doc[field] = narratives.get(field)
+    return doc
+
+
+def _iter_archive_files(archive_dir: str) -> Iterable[Dict[str, Any]]:
+    for path in sorted(glob.glob(os.path.join(archive_dir, "*", "*", "predictions-*.ndjson.gz"))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json_util.loads(line, json_options=_JSON_OPTIONS)
+
+
+def load_archived_history(
+    doctor_id: str,
+    patient_id: str,
+    include_narratives: bool = False,
+    target: str = RETENTION_ARCHIVE_TARGET,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    fields: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Return a patient's archived predictions, newest first.
+
+    The cold collection is queried directly; the file archive has no index,
+    so every partition is scanned (acceptable for an explicit, rare request).
+    `fields` limits the returned fields (plus `_id` and `archived_at`).
+    """
+    keep = None
+    if fields is not None:
+        keep = ["_id", "archived_at", *fields] + (["narrative"] if include_narratives else [])
+    if target == "files":
+        seen = set()
+        docs = []
+        for doc in _iter_archive_files(archive_dir):
+            if doc.get("doctorId") != doctor_id or doc.get("patientId") != patient_id:
+                continue
+            if doc["_id"] in seen:
+                continue
+            seen.add(doc["_id"])
+            docs.append(doc if keep is None else {k: doc[k] for k in keep if k in doc})
+        docs.sort(key=lambda d: d.get("created_at") or datetime.min, reverse=True)
+    else:
+        if keep is not None:
+            projection = {k: 1 for k in keep}
+        else:
+            projection = None if include_narratives else {"narrative": 0}
+        docs = list(
+            archive_collection.find({"doctorId": doctor_id, "patientId": patient_id}, projection)
+            .sort("created_at", -1)
+        )
+    return [_expand_narrative(doc, include_narratives) for doc in docs]
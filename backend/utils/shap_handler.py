@@ -1,7 +1,10 @@
 import shap
 import numpy as np
 
+from utils.metrics import timed
 
+
+@timed("shap")
 def get_top_features(explainer, x_np, feature_names, top=5):
     """
     Return top `top` features by absolute SHAP value for the first sample in x_np.
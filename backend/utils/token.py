@@ -1,5 +1,7 @@
 from config import JWT_SECRET
 from datetime import datetime, timedelta
+from flask import g, has_request_context
+from utils.metrics import timed
 
 
 def _get_jwt_encoder():
@@ -53,6 +55,7 @@ def _get_jwt_decoder():
     )
 
 
+@timed("jwt_encode")
 def generate_token(email, name=None, role=None):
     payload = {
         "email": email,
@@ -71,10 +74,28 @@ def generate_token(email, name=None, role=None):
     return token
 
 
+@timed("jwt_decode")
+def _decode(token):
+    decoder = _get_jwt_decoder()
+    return decoder(token, JWT_SECRET, algs=["HS256"])
+
+
 def decode_token(token):
     """Decode a JWT and return its payload.
 
-    Raises an exception if the token is invalid or expired.
+    Raises an exception if the token is invalid or expired. Within a request
+    the outcome is kept in `g`, so admission control and the route decode the
+    bearer token (and time `jwt_decode`) only once.
     """
-    decoder = _get_jwt_decoder()
-    return decoder(token, JWT_SECRET, algs=["HS256"])
+    if not has_request_context():
+        return _decode(token)
+    cached = g.get("_jwt_decoded")
+    if cached is None or cached[0] != token:
+        try:
+            cached = (token, _decode(token), None)
+        except Exception as e:
+            cached = (token, None, e)
+        g._jwt_decoded = cached
+    if cached[2] is not None:
+        raise cached[2]
+    return cached[1]